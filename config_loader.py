@@ -1,8 +1,190 @@
 # config_loader.py
 import json
+import mmap
+from collections import namedtuple
+from functools import reduce
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Set, Tuple
 import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, stdlib json is used otherwise
+    orjson = None
+
+
+def _freeze(obj: Any) -> Any:
+    """Recursively wrap dicts in MappingProxyType and turn lists into tuples"""
+    if isinstance(obj, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(item) for item in obj)
+    return obj
+
+
+def _unfreeze(obj: Any) -> Any:
+    """Deep, mutable copy of a frozen config (the inverse of _freeze)"""
+    if isinstance(obj, MappingProxyType):
+        return {key: _unfreeze(value) for key, value in obj.items()}
+    if isinstance(obj, tuple):
+        return [_unfreeze(item) for item in obj]
+    return obj
+
+
+def _thaw(obj: Any) -> Any:
+    """Serializer hook so frozen configs can be written back out"""
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_UTF8_BOM = b'\xef\xbb\xbf'
+
+# Compact output is the default; pretty (2-space indent) is for files a person will read first
+if orjson is not None:
+    def _loads(data: bytes) -> Any:
+        # orjson rejects a UTF-8 BOM (as written by e.g. Notepad); stdlib json decoding accepts it
+        if data[:3] == _UTF8_BOM:
+            data = data[3:]
+        return orjson.loads(data)
+    
+    def _dumps(obj: Any, pretty: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_thaw, option=option)
+else:
+    # Built once and reused; json.loads/json.dumps construct these on every call
+    _decode = json.JSONDecoder().decode
+    _encode_pretty = json.JSONEncoder(indent=2, ensure_ascii=False, default=_thaw).encode
+    _encode_compact = json.JSONEncoder(separators=(',', ':'), default=_thaw).encode
+    
+    def _loads(data: bytes) -> Any:
+        return _decode(data.decode(json.detect_encoding(data), 'surrogatepass'))
+    
+    def _dumps(obj: Any, pretty: bool = False) -> bytes:
+        if pretty:
+            return _encode_pretty(obj).encode('utf-8')
+        return _encode_compact(obj).encode('ascii')
+
+
+# Files at least this large are parsed straight from a read-only mmap (orjson only)
+_MMAP_THRESHOLD = 64 * 1024
+
+
+def _load_file(config_file: Path) -> Any:
+    """Parse a JSON config file, mapping large files instead of copying them into memory"""
+    if orjson is not None and config_file.stat().st_size >= _MMAP_THRESHOLD:
+        with open(config_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return _loads(view)
+    return _loads(config_file.read_bytes())
+
+
+def _yes_no(raw: str) -> bool:
+    return bool(raw) and raw[0] in ('y', 'Y')
+
+
+def _vat_rate(raw: str) -> int:
+    """A whole-number percentage from 0 to 100; anything else falls back to 16"""
+    if raw.isdecimal():
+        rate = int(raw)
+        if rate <= 100:
+            return rate
+    return 16
+
+
+# One interactive prompt: the answer (or default when left blank) is passed
+# through caster and stored under key, nested in config[section] if given
+Field = namedtuple('Field', 'key prompt default caster section')
+
+# (header lines, fields) in prompt order
+CONFIG_SCHEMA = (
+    (("--- System Settings ---",), (
+        Field('headless', "Run in headless mode? (y/n): ", "", _yes_no, None),
+        Field('storage_location', "Storage Location (e.g., 'Main Store'): ", "Main Store", str, None),
+        Field('default_department', "Default department for new categories (e.g., 'Pharmacy'): ", "Pharmacy", str, None),
+    )),
+    (("--- Authentication ---",), (
+        Field('base_url', "Medicentre v3 URL: ", "", str, None),
+        Field('accesscode', "Access Code: ", "", str, None),
+        Field('branch', "Branch: ", "", str, None),
+        Field('username', "Username: ", "", str, None),
+        Field('password', "Password: ", "", str, None),
+    )),
+    ((
+        "--- Account Mappings (Optional - can be configured later) ---",
+        "These are the main accounts that sub-accounts will be created under.",
+        "Press Enter to use defaults or specify custom names.",
+    ), (
+        Field('inventory_main', "Inventory main account [Inventory]: ", "Inventory", str, 'account_mappings'),
+        Field('inventory_class', "Inventory account class [Current Assets]: ", "Current Assets", str, 'account_mappings'),
+        Field('revenue_main', "Revenue main account [Revenue]: ", "Revenue", str, 'account_mappings'),
+        Field('revenue_class', "Revenue account class [Income]: ", "Income", str, 'account_mappings'),
+        Field('cost_main', "Cost of Sales main account [Cost of Goods Sold]: ", "Cost of Goods Sold", str, 'account_mappings'),
+        Field('cost_class', "Cost of Sales account class [Cost of Goods Sold]: ", "Cost of Goods Sold", str, 'account_mappings'),
+    )),
+    (("--- VAT Defaults (Optional) ---",), (
+        Field('vat_default_rate', "Default VAT rate if not specified (0-100) [16]: ", "", _vat_rate, None),
+        Field('vat_default_tax_code', "Default VAT tax code [E]: ", "E", str, None),
+    )),
+    (("--- File Paths ---",), (
+        Field('last_csv_path', "Default CSV file path: ", "", str, None),
+    )),
+)
+
+# Settings written without prompting
+CONFIG_CONSTANTS = {
+    'default_timeout': 30,
+    'enable_screenshots': True,
+    'screenshot_dir': "logs/screenshots",
+    'log_dir': "logs",
+}
+
+
+def _patch_path(config_file: Path) -> Path:
+    """Append-only log of field updates kept next to the config file"""
+    return config_file.with_name(config_file.name + '.patch.jsonl')
+
+
+def _set_path(config: Dict[str, Any], field_path: str, value: Any):
+    """Set a (possibly dotted) field, creating missing nested levels"""
+    if '.' not in field_path:
+        # Top-level key: nothing to split or descend
+        config[field_path] = value
+        return
+    
+    keys = field_path.split('.')
+    parent = reduce(_child_section, keys[:-1], config)
+    parent[keys[-1]] = value
+
+
+def _child_section(node: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """The nested dict under key (created if missing); TypeError if key holds a plain value"""
+    child = node.setdefault(key, {})
+    if not isinstance(child, dict):
+        raise TypeError(f"'{key}' holds a {type(child).__name__} value, not a section")
+    return child
+
+
+def _prefetch(config_file: Path):
+    """Ask the OS to start reading the config into the page cache"""
+    try:
+        fd = os.open(config_file, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 class ConfigLoader:
@@ -10,122 +192,254 @@ class ConfigLoader:
     
     DEFAULT_CONFIG_PATH = Path("medicentre_config.json")
     
+    # Parsed configurations keyed by (absolute path, file mtime, patch log mtime) in ns
+    _CACHE: Dict[Tuple[str, int, int], Mapping[str, Any]] = {}
+    
+    # Patch logs longer than this are folded back into the main file on read
+    PATCH_COMPACT_THRESHOLD = 100
+    
+    # Configs with a 'refresh_url' are re-fetched in the background once older
+    # than 'refresh_ttl' seconds (default below); startup never waits on it
+    REFRESH_TTL_SECONDS = 3600
+    _REFRESHING: Set[str] = set()
+    _REFRESH_LOCK = threading.Lock()
+    
+    # Held while appending to a patch log, and from reading it until it is folded in and removed,
+    # so a field update cannot land between the two and be lost (reentrant: _refresh nests saves)
+    _PATCH_LOCK = threading.RLock()
+    
+    @staticmethod
+    def prefetch(config_path: Optional[str] = None):
+        """
+        Start reading a config file into the OS page cache in the background (POSIX only),
+        so a load_config later in startup does not wait on a cold disk read.
+        """
+        config_file = Path(config_path) if config_path else ConfigLoader.DEFAULT_CONFIG_PATH
+        if hasattr(os, 'posix_fadvise') and config_file.exists():
+            threading.Thread(target=_prefetch, args=(config_file,), daemon=True).start()
+    
+    @staticmethod
+    def invalidate_cache(config_file: Optional[Path] = None):
+        """Drop cached configurations (all, or only those for config_file)"""
+        if config_file is None:
+            ConfigLoader._CACHE.clear()
+            return
+        ConfigLoader._evict(Path(config_file).resolve())
+    
+    @staticmethod
+    def _evict(resolved: Path):
+        """Drop cached configurations for an already-resolved path"""
+        resolved = str(resolved)
+        for key in [k for k in ConfigLoader._CACHE if k[0] == resolved]:
+            del ConfigLoader._CACHE[key]
+    
     @staticmethod
     def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
-        """Load configuration from file or create new if doesn't exist"""
+        """
+        Load configuration from file or create new if doesn't exist.
+        The result is the caller's own copy and may be modified freely.
+        """
+        return _unfreeze(ConfigLoader.load_config_readonly(config_path))
+    
+    @staticmethod
+    def load_config_readonly(config_path: Optional[str] = None) -> Mapping[str, Any]:
+        """
+        Like load_config, but returns the shared cached configuration without copying it.
+        The result is read-only: nested dicts are MappingProxyType and lists are tuples.
+        """
         if config_path:
             config_file = Path(config_path)
         else:
             config_file = ConfigLoader.DEFAULT_CONFIG_PATH
         
-        if config_file.exists():
-            print(f"Loading configuration from: {config_file}")
-            try:
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                print("✓ Configuration loaded successfully")
-                return config
-            except Exception as e:
-                print(f"✗ Error loading configuration: {e}")
-                return ConfigLoader.create_new_config(config_file)
+        # Resolved once per call (not memoized, so relative paths follow os.chdir) and passed down
+        resolved = config_file.resolve()
+        if resolved.exists():
+            stat = resolved.stat()
+            patch_file = _patch_path(resolved)
+            patch_mtime = patch_file.stat().st_mtime_ns if patch_file.exists() else 0
+            key = (str(resolved), stat.st_mtime_ns, patch_mtime)
+            config = ConfigLoader._CACHE.get(key)
+            if config is None:
+                print(f"Loading configuration from: {config_file}")
+                try:
+                    config = _freeze(ConfigLoader._read_resolved(resolved))
+                    print("✓ Configuration loaded successfully")
+                    ConfigLoader._evict(resolved)
+                    ConfigLoader._CACHE[key] = config
+                except Exception as e:
+                    print(f"✗ Error loading configuration: {e}")
+                    return _freeze(ConfigLoader.create_new_config(config_file))
+            
+            # Serve the on-disk snapshot now; refresh it in the background if stale
+            ConfigLoader._schedule_refresh(resolved, config, time.time() - stat.st_mtime)
+            return config
         else:
             print(f"No configuration file found at: {config_file}")
-            return ConfigLoader.create_new_config(config_file)
+            return _freeze(ConfigLoader.create_new_config(config_file))
     
     @staticmethod
-    def create_new_config(config_file: Path) -> Dict[str, Any]:
-        """Create a new configuration through interactive prompts"""
-        print("\n" + "="*60)
-        print("CREATING NEW CONFIGURATION")
-        print("="*60)
-        
-        config = {}
+    def read_config(config_file: Path) -> Dict[str, Any]:
+        """
+        Read a config file with its pending field updates applied (no prompts).
+        Raises FileNotFoundError when the file does not exist.
+        """
+        return ConfigLoader._read_resolved(Path(config_file).resolve())
+    
+    @staticmethod
+    def _read_resolved(config_file: Path) -> Dict[str, Any]:
+        """read_config for an already-resolved path"""
+        config = _load_file(config_file)
         
-        # System settings
-        print("\n--- System Settings ---")
-        config['headless'] = input("Run in headless mode? (y/n): ").strip().lower() in ["y", "yes"]
-        config['storage_location'] = input("Storage Location (e.g., 'Main Store'): ").strip() or "Main Store"
-        config['default_department'] = input("Default department for new categories (e.g., 'Pharmacy'): ").strip() or "Pharmacy"
+        patch_file = _patch_path(config_file)
+        if not patch_file.exists():
+            return config
         
-        # Authentication
-        print("\n--- Authentication ---")
-        config['base_url'] = input("Medicentre v3 URL: ").strip()
-        config['accesscode'] = input("Access Code: ").strip()
-        config['branch'] = input("Branch: ").strip()
-        config['username'] = input("Username: ").strip()
-        config['password'] = input("Password: ").strip()
+        with ConfigLoader._PATCH_LOCK:
+            try:
+                lines = patch_file.read_bytes().splitlines()
+            except FileNotFoundError:
+                # Folded in by a save between the exists() check and the read
+                return _load_file(config_file)
+            
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    entry = _loads(line)
+                    _set_path(config, entry['p'], entry['v'])
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    # e.g. a torn final line from an interrupted write; the rest still apply
+                    print(f"✗ Skipping unreadable entry in {patch_file}: {e}")
+            
+            if len(lines) > ConfigLoader.PATCH_COMPACT_THRESHOLD:
+                ConfigLoader._write_atomic(config_file, _dumps(config))
+                patch_file.unlink(missing_ok=True)
         
-        # Account mappings
-        print("\n--- Account Mappings (Optional - can be configured later) ---")
-        print("These are the main accounts that sub-accounts will be created under.")
-        print("Press Enter to use defaults or specify custom names.")
+        return config
+    
+    @staticmethod
+    def _schedule_refresh(config_file: Path, config: Mapping[str, Any], age: float):
+        """Start a background refresh when the config (resolved path) has a refresh_url and is older than its TTL"""
+        refresh_url = config.get('refresh_url')
+        if not refresh_url or age < config.get('refresh_ttl', ConfigLoader.REFRESH_TTL_SECONDS):
+            return
         
-        config['account_mappings'] = {
-            'inventory_main': input("Inventory main account [Inventory]: ").strip() or "Inventory",
-            'inventory_class': input("Inventory account class [Current Assets]: ").strip() or "Current Assets",
-            'revenue_main': input("Revenue main account [Revenue]: ").strip() or "Revenue",
-            'revenue_class': input("Revenue account class [Income]: ").strip() or "Income",
-            'cost_main': input("Cost of Sales main account [Cost of Goods Sold]: ").strip() or "Cost of Goods Sold",
-            'cost_class': input("Cost of Sales account class [Cost of Goods Sold]: ").strip() or "Cost of Goods Sold"
-        }
+        with ConfigLoader._REFRESH_LOCK:
+            if str(config_file) in ConfigLoader._REFRESHING:
+                return
+            ConfigLoader._REFRESHING.add(str(config_file))
         
-        # VAT configurations (can be extended)
-        print("\n--- VAT Defaults (Optional) ---")
-        config['vat_default_rate'] = input("Default VAT rate if not specified (0-100) [16]: ").strip()
-        config['vat_default_rate'] = int(config['vat_default_rate']) if config['vat_default_rate'].isdigit() else 16
+        threading.Thread(
+            target=ConfigLoader._refresh,
+            args=(config_file, refresh_url, config.get('default_timeout', 30)),
+            daemon=True
+        ).start()
+    
+    @staticmethod
+    def _refresh(config_file: Path, refresh_url: str, timeout: float):
+        """Fetch remote settings, merge them over the file on disk and save (failures are non-fatal)"""
+        try:
+            with urllib.request.urlopen(refresh_url, timeout=timeout) as response:
+                remote = _loads(response.read())
+            if not isinstance(remote, dict):
+                raise ValueError("remote configuration is not a JSON object")
+            # Merge into what is on disk now, not the snapshot served at startup
+            with ConfigLoader._PATCH_LOCK:
+                config = ConfigLoader._read_resolved(config_file)
+                config.update(remote)
+                ConfigLoader._save_resolved(config, config_file, False, config_file)
+        except Exception as e:
+            print(f"✗ Error refreshing configuration from {refresh_url}: {e}")
+        finally:
+            with ConfigLoader._REFRESH_LOCK:
+                ConfigLoader._REFRESHING.discard(str(config_file))
+    
+    @staticmethod
+    def create_new_config(config_file: Path) -> Dict[str, Any]:
+        """Create a new configuration through interactive prompts"""
+        sys.stdout.write("\n".join(["", "="*60, "CREATING NEW CONFIGURATION", "="*60, ""]))
         
-        config['vat_default_tax_code'] = input("Default VAT tax code [E]: ").strip() or "E"
+        config = {}
         
-        # File paths
-        print("\n--- File Paths ---")
-        config['last_csv_path'] = input("Default CSV file path: ").strip() or ""
+        for header, fields in CONFIG_SCHEMA:
+            sys.stdout.write("\n".join(("",) + header + ("",)))
+            for field in fields:
+                target = config if field.section is None else config.setdefault(field.section, {})
+                target[field.key] = field.caster(input(field.prompt).strip() or field.default)
         
-        # Additional settings
         print("\n--- Additional Settings ---")
-        config['default_timeout'] = 30
-        config['enable_screenshots'] = True
-        config['screenshot_dir'] = "logs/screenshots"
-        config['log_dir'] = "logs"
+        config.update(CONFIG_CONSTANTS)
         
-        # Save the configuration
-        ConfigLoader.save_config(config, config_file)
+        # Save the configuration (indented, since it is usually reviewed by hand next)
+        ConfigLoader.save_config(config, config_file, pretty=True)
         
         return config
     
     @staticmethod
-    def save_config(config: Dict[str, Any], config_file: Optional[Path] = None):
-        """Save configuration to file"""
+    def _write_atomic(config_file: Path, payload: bytes):
+        """Write payload to a uniquely named sibling temp file, then swap it into place"""
+        # mkstemp gives every writer (thread or process) its own temp file, so concurrent
+        # saves cannot clobber each other's half-written data before os.replace
+        try:
+            fd, tmp_name = tempfile.mkstemp(prefix=config_file.name + '.', suffix='.tmp', dir=config_file.parent)
+        except FileNotFoundError:
+            # Only a brand-new location pays for creating the directory
+            config_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(prefix=config_file.name + '.', suffix='.tmp', dir=config_file.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            try:
+                # mkstemp files are owner-only; keep the permissions an existing config already has
+                os.chmod(tmp_name, config_file.stat().st_mode & 0o777)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_name, config_file)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+    
+    @staticmethod
+    def save_config(config: Mapping[str, Any], config_file: Optional[Path] = None, pretty: bool = False):
+        """Save configuration to file (compact unless pretty=True)"""
         if not config_file:
             config_file = ConfigLoader.DEFAULT_CONFIG_PATH
-        
+        ConfigLoader._save_resolved(config, Path(config_file).resolve(), pretty, config_file)
+    
+    @staticmethod
+    def _save_resolved(config: Mapping[str, Any], resolved: Path, pretty: bool, shown_as: Path):
+        """save_config for an already-resolved path (shown_as is the path as the caller gave it)"""
         try:
-            config_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-            print(f"✓ Configuration saved to: {config_file}")
+            with ConfigLoader._PATCH_LOCK:
+                ConfigLoader._write_atomic(resolved, _dumps(config, pretty))
+                # A full snapshot supersedes any pending field updates
+                _patch_path(resolved).unlink(missing_ok=True)
+            ConfigLoader._evict(resolved)
+            print(f"✓ Configuration saved to: {shown_as}")
         except Exception as e:
             print(f"✗ Error saving configuration: {e}")
     
     @staticmethod
     def update_config_field(config_file: Path, field_path: str, value: Any):
-        """Update a specific field in the configuration"""
+        """
+        Update a specific field in the configuration.
+        The change is appended to the patch log rather than rewriting the whole file,
+        and only once it has applied cleanly to the current configuration.
+        """
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # Navigate through nested structure
-            keys = field_path.split('.')
-            current = config
-            for key in keys[:-1]:
-                if key not in current:
-                    current[key] = {}
-                current = current[key]
-            current[keys[-1]] = value
+            config_file = Path(config_file).resolve()
+            if not config_file.exists():
+                raise FileNotFoundError(f"No configuration file found at: {config_file}")
             
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            with ConfigLoader._PATCH_LOCK:
+                # Raises (and records nothing) if the path runs through a plain value
+                _set_path(ConfigLoader._read_resolved(config_file), field_path, value)
+                with open(_patch_path(config_file), 'ab') as f:
+                    f.write(_dumps({'p': field_path, 'v': value}) + b"\n")
+            ConfigLoader._evict(config_file)
             
             print(f"✓ Updated {field_path} = {value}")
             
         except Exception as e:
-            print(f"✗ Error updating configuration: {e}")
\ No newline at end of file
+            print(f"✗ Error updating configuration: {e}")
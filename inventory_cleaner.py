@@ -2,20 +2,148 @@ import csv
 import re
 from datetime import datetime, timedelta
 from pathlib import Path
-import sys
 import os
+import traceback
 from dotenv import load_dotenv
-from typing import Dict, List, Tuple, Optional, Any, Set
+from typing import Dict, List, Tuple, Optional, Any
 from difflib import SequenceMatcher  # For similarity comparison
+from functools import lru_cache
+from operator import itemgetter
+from types import MappingProxyType
+
+try:
+    from rapidfuzz.fuzz import ratio as _fuzz_ratio
+except ImportError:  # optional speed-up, difflib is used otherwise
+    _fuzz_ratio = None
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+# Common filler words that don't affect the meaning of an account name
+_FILLER_WORDS = frozenset({'the', 'and', '&', 'for', 'to', 'in', 'of'})
+
+
+def _preprocess_for_comparison(text: str) -> str:
+    """Normalize text for similarity comparison"""
+    # Lowercase and replace hyphens with spaces; split() also drops extra whitespace
+    words = text.lower().replace('-', ' ').split()
+    return ' '.join(w for w in words if w not in _FILLER_WORDS)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(text: str) -> Optional[datetime]:
+    """Parse a dd/mm/yyyy date, or None if invalid; files repeat the same few dates"""
+    try:
+        return datetime.strptime(text, '%d/%m/%Y')
+    except ValueError:
+        return None
+
+
+def _is_blank_row(row: Dict) -> bool:
+    """True if every cell is empty or whitespace; stops at the first non-blank cell"""
+    # DictReader fills short rows with None and collects extra cells in a list; neither counts as blank
+    return not any(value.strip() if isinstance(value, str) else True for value in row.values())
+
+
+# Strips currency symbols, thousands separators and spaces from numeric cells
+_NUM_CLEAN_RE = re.compile(r'[^\d.-]')
+
+
+@lru_cache(maxsize=4096)
+def _parse_number(text: str) -> Optional[float]:
+    """Parse a numeric cell, or None if nothing numeric is left; raises ValueError if malformed"""
+    # Plain "1500" / "12.50" cells have nothing to strip, so skip the regex for them
+    whole, _, fraction = text.partition('.')
+    if whole.isdecimal() and (not fraction or fraction.isdecimal()):
+        return float(text)
+    cleaned = _NUM_CLEAN_RE.sub('', text)
+    if not cleaned:
+        return None
+    return float(cleaned)
+
+
+# Similarity ratio in [0, 1] between two preprocessed strings
+if _fuzz_ratio is not None:
+    def _similarity(a: str, b: str) -> float:
+        return _fuzz_ratio(a, b) / 100.0
+else:
+    def _similarity(a: str, b: str) -> float:
+        return SequenceMatcher(None, a, b).ratio()
+
+
+# Words kept upper-case after Title Case
+_ACRONYMS = frozenset({'Vat', 'Dr', 'Mr', 'Mrs', 'Ms', 'Ceo', 'Cfo'})
+
+# str.title() capitalizes after an apostrophe ("Don'T", "Johnson'S"); these endings go back to lower case
+_CONTRACTION_RE = re.compile(r"(?<=[^\W\d_]['’])(?:S|T|D|M|Ll|Re|Ve)\b")
+
+
+def _lower_match(match: re.Match) -> str:
+    return match.group(0).lower()
+
+
+@lru_cache(maxsize=4096)
+def _title_case(value: str) -> str:
+    """Title Case a value word by word, preserving acronyms, all-caps hyphenated parts and Title Case words"""
+    # Collapse whitespace and Title Case the whole string in one C-level call
+    words = value.split()
+    result = ' '.join(words).title()
+    
+    # For purely alphabetic words str.title() already gives the per-word result; words with
+    # apostrophes, digits or hyphens, and acronyms, need the word-by-word rules
+    if not ''.join(words).isalpha() or not _ACRONYMS.isdisjoint(result.split()):
+        title_words = []
+        for word, titled in zip(words, result.split()):
+            if titled in _ACRONYMS:
+                title_words.append(titled.upper())
+            elif '-' in word:
+                # Hyphenated parts that were entirely upper-case (e.g. 'X-RAY') keep their casing
+                parts = zip(word.split('-'), titled.split('-'))
+                title_words.append('-'.join(p if p.isupper() else t for p, t in parts))
+            elif len(word) > 1 and word[0].isupper() and word[1:].islower():
+                # Already Title Case (e.g. "O'brien", "Paracetamol500mg") - preserve
+                title_words.append(word)
+            else:
+                title_words.append(_CONTRACTION_RE.sub(_lower_match, titled) if "'" in titled or '’' in titled else titled)
+        result = ' '.join(title_words)
+    
+    return result
+
+
+def _token_jaccard(a: str, b: str) -> float:
+    """Overlap of the word sets of two preprocessed strings"""
+    tokens_a, tokens_b = frozenset(a.split()), frozenset(b.split())
+    return len(tokens_a & tokens_b) / max(1, len(tokens_a | tokens_b))
+
+
+# Word-set overlap at or above this counts as a match without character-level scoring
+_TOKEN_MATCH_THRESHOLD = 0.85
+
+
+@lru_cache(maxsize=4096)
+def _sub_account_similarity(value: str, default_value: str) -> float:
+    """Similarity between a sub-account cell and its configured default"""
+    processed_value = _preprocess_for_comparison(value)
+    processed_default = _preprocess_for_comparison(default_value)
+    
+    # Same words in any order is a match outright; only the rest need the character ratio
+    jaccard = _token_jaccard(processed_value, processed_default)
+    if jaccard >= _TOKEN_MATCH_THRESHOLD:
+        return jaccard
+    return _similarity(processed_value, processed_default)
+
+
+def _with_count(message: str, count: int) -> str:
+    """Report line for an event, noting how often it repeated"""
+    return message if count == 1 else f"{message} (×{count})"
+
+
 class InventoryDataCleaner:
     """Cleans and standardizes inventory data for Medicentre v3"""
     
     # Unit of measure normalization mapping (all lowercase for case-insensitive matching)
-    UNIT_MAPPING = {
+    UNIT_MAPPING = MappingProxyType({
     "tab": "Tablet", "tablet": "Tablet", "tabs": "Tablet", "tb": "Tablet",
     "tbs": "Tablet", "tbl": "Tablet", "tbt": "Tablet", "caplet": "Tablet",
     "caplets": "Tablet", "loz": "Lozenge", "lozenge": "Lozenge",
@@ -26,7 +154,7 @@ class InventoryDataCleaner:
     "ampules": "Ampoule", "sachet": "Sachet", "sachets": "Sachet",
     "satchet": "Sachet", "satchets": "Sachet", "strip": "Strip",
     "strips": "Strip", "blister": "Strip", "blisters": "Strip",
-    "pack": "Pack", "packs": "Pack", "pkt": "Pack", "paket": "Packet",
+    "pack": "Pack", "packs": "Pack", "pkt": "Pack", "paket": "Pack",
     "box": "Box", "boxes": "Box", "bx": "Box", "ctn": "Carton", 
     "tin": "Tin", "can": "Can", "jar": "Jar", "tube": "Tube", "tubes": "Tube",
     "millilitre": "Ml", "mls": "Ml", "syrup": "Ml", "suspension": "Ml", 
@@ -39,15 +167,39 @@ class InventoryDataCleaner:
     "kilogram": "Kg", "kilogrammes": "Kg", "pc": "Piece", "pcs": "Piece",
     "piece": "Piece", "pce": "Piece", "supp": "Suppository", 
     "supps": "Suppository", "supository": "Suppository", "pessary": "Pessary",
-    "ovule": "Pessary", "kit":"Kit", "capsules": "Capsule", "tablets":"Tablet"
-    }
+    "ovule": "Pessary", "kit":"Kit", "tablets":"Tablet"
+    })
     
     # List of canonical units in their correct Title Case form
     CANONICAL_UNITS = [
         'Tablet', 'Capsule', 'Bottle', 'Vial', 'Ampoule', 'Sachet', 'Strip',
         'Pack', 'Box', 'Tube', 'Ml', 'Mg', 'Litre', 'G', 'Kg', 'Unit', 'Jar',
-        'Lozenge', 'Piece', 'Pessary', 'Kit', 'Suppository'
+        'Lozenge', 'Piece', 'Pessary', 'Kit', 'Suppository', 'Carton', 'Tin',
+        'Can', 'Drop', 'Ointment'
     ]
+    _CANONICAL_UNITS_SET = frozenset(CANONICAL_UNITS)
+    
+    # Every mapped unit must be canonical, or cleaned output would prompt again on the next run
+    _non_canonical = set(UNIT_MAPPING.values()) - _CANONICAL_UNITS_SET
+    if _non_canonical:
+        raise ValueError(f"UNIT_MAPPING values not in CANONICAL_UNITS: {sorted(_non_canonical)}")
+    del _non_canonical
+    
+    # Position of each UNIT_MAPPING key, so prefix matches can honour mapping order without scanning it
+    _UNIT_KEY_ORDER = {key: position for position, key in enumerate(UNIT_MAPPING)}
+    _UNIT_KEY_MAX_LEN = max(map(len, UNIT_MAPPING))
+    
+    # Finding a unit in a product name: UNIT_MAPPING spellings, longest first. One- and two-letter
+    # abbreviations ('l', 'tb', 'gr') are ordinary name words too ('L-Arginine', 'Tb Test'), so they
+    # only count directly after a number ('5L', '30 Gm')
+    _UNIT_IN_NAME_RE = re.compile(
+        r'\b(' + '|'.join(re.escape(k) for k in sorted(UNIT_MAPPING, key=len, reverse=True) if len(k) > 2) + r')\b',
+        re.IGNORECASE
+    )
+    _UNIT_AFTER_NUMBER_RE = re.compile(
+        r'\d\s*(' + '|'.join(re.escape(k) for k in sorted(UNIT_MAPPING, key=len, reverse=True) if len(k) <= 2) + r')\b',
+        re.IGNORECASE
+    )
     
     REQUIRED_COLUMNS = [
         'Name', 'Batch', 'ItemCode', 'Barcode', 'AssetSubAccount', 'RevenueSubAccount',
@@ -61,6 +213,19 @@ class InventoryDataCleaner:
         'CostOfSaleSubAccount', 'ItemClass', 'ItemCategory'
     ]
     
+    # Sub-account columns and the user_defaults key holding each one's authoritative value
+    _SUB_ACCOUNT_COLUMNS = (
+        ('AssetSubAccount', 'default_asset_account'),
+        ('RevenueSubAccount', 'default_revenue_account'),
+        ('CostOfSaleSubAccount', 'default_cost_account'),
+    )
+    
+    # Numeric fields kept as 2-decimal currency; the rest are whole numbers
+    _CURRENCY_FIELDS = frozenset({'UnitCost', 'UnitPrice'})
+    
+    # Known VAT types keyed by their lowercase form
+    _VAT_CANON_BY_LOWER = {v.lower(): v for v in ('VAT Exempt', 'Standard VAT', 'Zero Rated', 'Exempt')}
+    
     def __init__(self, csv_path: str, user_defaults: Dict):
         """
         Initialize cleaner with CSV path and user defaults
@@ -80,38 +245,104 @@ class InventoryDataCleaner:
         """
         self.csv_path = csv_path
         self.user_defaults = user_defaults
-        self.cleaned_data = []
+        self.rows_cleaned = 0  # Rows written to the cleaned output file
+        # normalizations, defaults_used and warnings are aggregated by _record:
+        # (message template, args) -> [first row, count], formatted only when the report is written
         self.report = {
-            'normalizations': [],
+            'normalizations': {},
             'user_decisions': [],
-            'defaults_used': [],
-            'warnings': [],
+            'defaults_used': {},
+            'warnings': {},
             'errors': [],
             'duplicates_removed': []  # New section for tracking duplicates
         }
         self.unit_resolutions = {}  # Track user resolutions for unknown units
-        self.seen_names: Set[str] = set()  # Track normalized product names for de-duplication
+        self._unit_cache: Dict[str, Tuple[str, str]] = {}  # Unit text -> mapping/prefix lookup result
+        self.seen_names: Dict[str, int] = {}  # Normalized product name -> row that first used it
         
         # Set default defaults if not provided
         self.user_defaults.setdefault('default_reorder_level', 10)
         self.user_defaults.setdefault('default_asset_account', 'Inventory - Pharmacy Drugs')
         self.user_defaults.setdefault('default_revenue_account', 'Sales - Pharmacy Drugs')
         self.user_defaults.setdefault('default_cost_account', 'Cost Of Goods Sold - Pharmacy Drugs')
+        
+        # One lookup table for unit normalization: canonical units and their plurals,
+        # overridden by explicit UNIT_MAPPING entries (keys are lowercase, no spaces)
+        self._unit_index: Dict[str, str] = {}
+        for canonical in self.CANONICAL_UNITS:
+            lower = canonical.lower()
+            self._unit_index[lower] = canonical
+            self._unit_index[lower + 's'] = canonical
+            if lower.endswith(('s', 'x', 'z', 'ch', 'sh')):
+                self._unit_index[lower + 'es'] = canonical
+            elif lower.endswith('y'):
+                self._unit_index[lower[:-1] + 'ies'] = canonical
+        self._unit_index.update(self.UNIT_MAPPING)
+        
+        # Per-row methods work without process(); validate_defaults re-binds these for each run
+        self._bind_defaults()
     
 
+    def _record(self, section: str, row_index: Optional[int], template: str, *args):
+        """Count a report event; repeats of the same event on other rows share one entry"""
+        entries = self.report[section]
+        entry = entries.get((template, args))
+        if entry is None:
+            entries[(template, args)] = [row_index, 1]
+        else:
+            entry[1] += 1
+    
+    def report_entries(self, section: str) -> List[Tuple[str, int]]:
+        """(message, count) for each distinct event in an aggregated report section"""
+        entries = []
+        for (template, args), (first_row, count) in self.report[section].items():
+            message = template.format(*args)
+            if first_row is not None:
+                message = f"Row {first_row}: {message}"
+            entries.append((message, count))
+        return entries
+    
+    def report_count(self, section: str) -> int:
+        """Number of events recorded in a report section"""
+        if isinstance(self.report[section], dict):
+            return sum(count for _, count in self.report[section].values())
+        return len(self.report[section])
+    
+    def _bind_defaults(self):
+        """Compute the run-wide values the per-row paths read from user_defaults (no validation)"""
+        # Everything the per-row expiry handling needs is fixed for the run, so compute it once
+        self._today = datetime.now()
+        default_expiry = _parse_date(str(self.user_defaults.get('default_expiry_date', '')))
+        self._default_expiry_is_future = default_expiry is not None and default_expiry > self._today
+        self._computed_future_date_str = (self._today + timedelta(days=365)).strftime('%d/%m/%Y')
+        
+        # Converted once for handle_reorder_level; a value that is not a whole number is kept
+        # as given here, and validate_defaults rejects it before a run
+        reorder_level = self.user_defaults['default_reorder_level']
+        try:
+            self._default_reorder_level = int(reorder_level)
+        except (ValueError, TypeError):
+            self._default_reorder_level = reorder_level
+        
+        # Defaults the per-row unit and VAT paths read
+        self._default_unit = self.user_defaults.get('default_unit_of_measure')
+        self._default_vat_type = self.user_defaults.get('default_vat_type')
+    
     def validate_defaults(self):
         """Validate user-provided defaults"""
         # Validate expiry date format and future date
         try:
             expiry = datetime.strptime(self.user_defaults['default_expiry_date'], '%d/%m/%Y')
-            min_future_date = datetime.now() + timedelta(days=365)
-            if expiry <= min_future_date:
-                self.report['warnings'].append(
-                    f"Default expiry date {expiry.strftime('%d/%m/%Y')} is not at least 1 year in future"
-                )
         except ValueError:
             raise ValueError(f"Invalid expiry date format. Expected dd/mm/yyyy, got {self.user_defaults['default_expiry_date']}")
         
+        self._bind_defaults()
+        min_future_date = self._today + timedelta(days=365)
+        if expiry <= min_future_date:
+            self._record('warnings', None,
+                "Default expiry date {} is not at least 1 year in future", expiry.strftime('%d/%m/%Y')
+            )
+        
         # Validate reorder level is integer
         try:
             reorder_level = int(self.user_defaults['default_reorder_level'])
@@ -129,40 +360,13 @@ class InventoryDataCleaner:
             return value
         
         original_value = value
-        
-        # Convert to Title Case with smart handling
-        words = value.split()
-        title_words = []
-        
-        for word in words:
-            # Handle special cases
-            if word.upper() in ['VAT', 'DR', 'MR', 'MRS', 'MS', 'CEO', 'CFO']:
-                title_words.append(word.upper())
-            elif '-' in word:
-                # Handle hyphenated words
-                parts = word.split('-')
-                title_parts = [p.title() if not p.isupper() else p for p in parts]
-                title_words.append('-'.join(title_parts))
-            elif word.isupper():
-                # If entire word is uppercase, title case it
-                title_words.append(word.title())
-            elif word.islower():
-                # If entire word is lowercase, title case it
-                title_words.append(word.title())
-            else:
-                # Mixed case - preserve existing capitalization if it's already Title Case
-                # Check if it looks like Title Case (first letter capital, rest lowercase)
-                if len(word) > 1 and word[0].isupper() and word[1:].islower():
-                    title_words.append(word)  # Already Title Case, preserve
-                else:
-                    title_words.append(word.title())
-        
-        result = ' '.join(title_words)
+        # Cached per distinct value; the same strings repeat across thousands of rows
+        result = _title_case(value)
         
         # Log if change was made
         if original_value != result:
-            self.report['normalizations'].append(
-                f"Title Case applied to {column_name}: '{original_value}' → '{result}'"
+            self._record('normalizations', None,
+                "Title Case applied to {}: '{}' → '{}'", column_name, original_value, result
             )
         
         return result
@@ -180,76 +384,61 @@ class InventoryDataCleaner:
         Returns:
             Normalized account name
         """
-        if not value or value.strip() == '':
+        original_value = value.strip() if value else ''
+        if not original_value:
             # Empty value - use default (existing behavior)
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Empty {account_type} replaced with default '{default_value}'"
+            self._record('defaults_used', row_index,
+                "Empty {} replaced with default '{}'", account_type, default_value
             )
             return default_value
         
-        original_value = value.strip()
-        
-        # Step 1: Preprocess for comparison
-        def preprocess_for_comparison(text: str) -> str:
-            """Normalize text for similarity comparison"""
-            # Convert to lowercase
-            text = text.lower()
-            # Remove all hyphens and replace with space
-            text = text.replace('-', ' ')
-            # Remove extra whitespace
-            text = re.sub(r'\s+', ' ', text)
-            # Remove common filler words that don't affect meaning
-            filler_words = ['the', 'and', '&', 'for', 'to', 'in', 'of']
-            words = text.split()
-            filtered_words = [w for w in words if w not in filler_words]
-            return ' '.join(filtered_words).strip()
-        
-        # Step 2: Check similarity
-        processed_value = preprocess_for_comparison(original_value)
-        processed_default = preprocess_for_comparison(default_value)
-        
-        # Calculate similarity ratio using difflib
-        similarity_ratio = SequenceMatcher(None, processed_value, processed_default).ratio()
+        # Cells that already hold the default need no scoring at all
+        if original_value == default_value:
+            return default_value
+        
+        # Step 1-2: Preprocess and check similarity (cached per distinct value/default pair);
+        # a case-only difference always scores 1.0, so skip straight to it
+        if original_value.lower() == default_value.lower():
+            similarity_ratio = 1.0
+        else:
+            similarity_ratio = _sub_account_similarity(original_value, default_value)
         
         # Step 3: Determine action based on similarity
         # Thresholds can be adjusted based on testing
         if similarity_ratio >= 0.85:  # High similarity - normalize to exact default
             if original_value != default_value:
-                self.report['normalizations'].append(
-                    f"Row {row_index}: {account_type} normalized "
-                    f"'{original_value}' → '{default_value}' "
-                    f"(similarity: {similarity_ratio:.2f})"
+                self._record('normalizations', row_index,
+                    "{} normalized '{}' → '{}' (similarity: {:.2f})",
+                    account_type, original_value, default_value, similarity_ratio
                 )
             return default_value
         elif similarity_ratio >= 0.60:  # Moderate similarity - still normalize
             if original_value != default_value:
-                self.report['normalizations'].append(
-                    f"Row {row_index}: {account_type} normalized "
-                    f"'{original_value}' → '{default_value}' "
-                    f"(similarity: {similarity_ratio:.2f})"
+                self._record('normalizations', row_index,
+                    "{} normalized '{}' → '{}' (similarity: {:.2f})",
+                    account_type, original_value, default_value, similarity_ratio
                 )
             return default_value
         else:  # Low similarity - replace with default (not a normalization)
-            self.report['defaults_used'].append(
-                f"Row {row_index}: {account_type} replaced "
-                f"'{original_value}' → '{default_value}' "
-                f"(similarity: {similarity_ratio:.2f} too low)"
+            self._record('defaults_used', row_index,
+                "{} replaced '{}' → '{}' (similarity: {:.2f} too low)",
+                account_type, original_value, default_value, similarity_ratio
             )
             return default_value
     
     def clean_name(self, name: str) -> str:
         """Clean product name (after Title Case has been applied)"""
+        # Title Case has already collapsed whitespace, so only names with commas need any work
+        if ',' not in name:
+            return name
+        
         original = name
         
-        # Replace commas with spaces
-        name = name.replace(',', ' ')
-        # Remove duplicate spaces
-        name = re.sub(r'\s+', ' ', name)
-        # Trim spaces
-        name = name.strip()
+        # Replace commas with spaces, then collapse and trim whitespace in one pass
+        name = ' '.join(name.replace(',', ' ').split())
         
         if original != name:
-            self.report['normalizations'].append(f"Name cleaned: '{original}' → '{name}'")
+            self._record('normalizations', None, "Name cleaned: '{}' → '{}'", original, name)
         
         return name
     
@@ -263,11 +452,11 @@ class InventoryDataCleaner:
         if not name:
             return ''
         # Normalize whitespace and convert to lowercase
-        return re.sub(r'\s+', ' ', name.strip()).lower()
+        return ' '.join(name.split()).lower()
     
     def check_duplicate_name(self, cleaned_name: str, row_index: int) -> Tuple[bool, Optional[int]]:
         """
-        Check if cleaned_name is a duplicate
+        Check if cleaned_name is a duplicate, remembering row_index as its first row if not
         Returns: (is_duplicate, retained_row_number)
         """
         normalized_name = self.normalize_name_key(cleaned_name)
@@ -279,44 +468,84 @@ class InventoryDataCleaner:
         if cleaned_name.startswith("EMPTY_NAME_ROW_"):
             return False, None
         
-        # Check if we've seen this normalized name before
-        if normalized_name in self.seen_names:
-            # Find which row originally had this name
-            for i, row in enumerate(self.cleaned_data, 1):
-                if self.normalize_name_key(row['Name']) == normalized_name:
-                    return True, i  # Found duplicate, return original row number
-        
+        # Check and record in one lookup: the first row to use a name is the one retained
+        retained_row = self.seen_names.setdefault(normalized_name, row_index)
+        if retained_row != row_index:
+            return True, retained_row
         return False, None
     
     def clean_vat_type(self, vat_type: str, row_index: int) -> str:
         """Clean VAT type"""
-        if not vat_type or vat_type.strip() == '':
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Empty VATType replaced with default '{self.user_defaults['default_vat_type']}'"
+        vat_type = vat_type.strip() if vat_type else ''
+        if not vat_type:
+            self._record('defaults_used', row_index,
+                "Empty VATType replaced with default '{}'", self._default_vat_type
             )
-            return self.user_defaults['default_vat_type']
+            return self._default_vat_type
+        
+        # Known VAT types keep their canonical casing; case-insensitive matches are corrected
+        valid = self._VAT_CANON_BY_LOWER.get(vat_type.lower())
+        if valid is not None:
+            if valid != vat_type:
+                self._record('normalizations', row_index,
+                    "VATType case corrected '{}' → '{}'", vat_type, valid
+                )
+            return valid
+        
+        # If not a known type, use default
+        self._record('warnings', row_index, "Unknown VATType '{}' replaced with default", vat_type)
+        return self._default_vat_type
+    
+    def _lookup_unit(self, unit: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Resolve a stripped, non-empty unit without asking the user
+        Returns: (normalized_unit or None if unknown, report note or None if nothing to report)
+        """
+        # FIX 1: Check if unit is already in canonical Title Case form
+        # FIX 2: Check if unit matches default unit (which may not be in CANONICAL_UNITS)
+        if unit in self._CANONICAL_UNITS_SET or unit == self._default_unit:
+            # Already correct, no normalization needed
+            return unit, None
         
-        vat_type = vat_type.strip()
+        # Check if already resolved by user in this session (case-insensitive)
+        resolved = self.unit_resolutions.get(unit.lower())
+        if resolved is not None:
+            return resolved, None
         
-        # Preserve existing casing for known VAT types
-        valid_casings = ['VAT Exempt', 'Standard VAT', 'Zero Rated', 'Exempt']
-        if vat_type in valid_casings:
-            return vat_type
+        # The lookups below depend only on the unit text, so each distinct spelling is matched once
+        cached = self._unit_cache.get(unit)
+        if cached is not None:
+            return cached
         
-        # Try to match case-insensitively
-        vat_lower = vat_type.lower()
-        for valid in valid_casings:
-            if valid.lower() == vat_lower:
-                self.report['normalizations'].append(
-                    f"Row {row_index}: VATType case corrected '{vat_type}' → '{valid}'"
-                )
-                return valid
+        # Known unit, canonical unit or plural of one (spaces removed, case-insensitive)
+        unit_no_spaces = unit.replace(' ', '').lower()
+        normalized = self._unit_index.get(unit_no_spaces)
+        if normalized is not None:
+            result = self._unit_cache[unit] = (normalized, ' (spaces removed)' if ' ' in unit else '')
+            return result
         
-        # If not a known type, use default
-        self.report['warnings'].append(
-            f"Row {row_index}: Unknown VATType '{vat_type}' replaced with default"
-        )
-        return self.user_defaults['default_vat_type']
+        # Check if unit starts with any known unit abbreviation
+        # This handles cases like "TAB S" where "S" might be extra
+        # Look up each prefix; the earliest key in UNIT_MAPPING wins, as a scan of the mapping would
+        best = None
+        for length in range(1, min(len(unit_no_spaces), self._UNIT_KEY_MAX_LEN) + 1):
+            position = self._UNIT_KEY_ORDER.get(unit_no_spaces[:length])
+            if position is not None and (best is None or position < best[0]):
+                best = (position, unit_no_spaces[:length])
+        if best is not None:
+            result = self._unit_cache[unit] = (self.UNIT_MAPPING[best[1]], ' (starts with)')
+            return result
+        
+        return None, None
+    
+    def _unit_in_name(self, product_name: str) -> Optional[str]:
+        """The unit word a product name ends on, e.g. 'Vials' in 'Injection Water 10Ml Vials'"""
+        # Pack units follow the strength, so the rightmost unit word wins
+        words = self._UNIT_IN_NAME_RE.findall(product_name)
+        if words:
+            return words[-1]
+        abbreviations = self._UNIT_AFTER_NUMBER_RE.findall(product_name)
+        return abbreviations[-1] if abbreviations else None
     
     def normalize_unit_of_measure(self, unit: str, product_name: str, row_index: int) -> str:
         """
@@ -326,105 +555,79 @@ class InventoryDataCleaner:
         Key Fix: Units already in canonical Title Case (e.g., 'Tablet', 'Capsule') 
         should NOT trigger user prompts.
         """
-        if not unit or unit.strip() == '':
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Empty UnitOfMeasure replaced with default '{self.user_defaults['default_unit_of_measure']}'"
+        unit = unit.strip() if unit else ''
+        if not unit:
+            found = self._unit_in_name(product_name) if product_name else None
+            if found:
+                normalized = self.UNIT_MAPPING[found.lower()]
+                self._record('normalizations', row_index,
+                    "Empty UnitOfMeasure set to '{}' from '{}' in Name", normalized, found
+                )
+                return normalized
+            self._record('defaults_used', row_index,
+                "Empty UnitOfMeasure replaced with default '{}'", self._default_unit
             )
-            return self.user_defaults['default_unit_of_measure']
-        
-        unit = unit.strip()
-        
-        # FIX 1: Check if unit is already in canonical Title Case form
-        if unit in self.CANONICAL_UNITS:
-            # Already correct, no normalization needed
-            return unit
+            return self._default_unit
         
-        # FIX 2: Check if unit matches default unit (which may not be in CANONICAL_UNITS)
-        if unit == self.user_defaults['default_unit_of_measure']:
-            # Matches default, no normalization needed
-            return unit
-        
-        # Check if already resolved by user in this session (case-insensitive)
-        unit_lower = unit.lower()
-        if unit_lower in self.unit_resolutions:
-            return self.unit_resolutions[unit_lower]
-        
-        # Remove spaces and check again
-        unit_no_spaces = unit.replace(' ', '').lower()
-        if unit_no_spaces in self.UNIT_MAPPING:
-            normalized = self.UNIT_MAPPING[unit_no_spaces]
-            if unit != normalized:
-                self.report['normalizations'].append(
-                    f"Row {row_index}: Unit normalized (spaces removed) '{unit}' → '{normalized}'"
+        normalized, note = self._lookup_unit(unit)
+        if normalized is not None:
+            if note is not None and unit != normalized:
+                self._record('normalizations', row_index,
+                    "Unit normalized{} '{}' → '{}'", note, unit, normalized
                 )
             return normalized
         
-        # Check mapping (case-insensitive)
-        if unit_lower in self.UNIT_MAPPING:
-            normalized = self.UNIT_MAPPING[unit_lower]
-            if unit != normalized:
-                self.report['normalizations'].append(
-                    f"Row {row_index}: Unit normalized '{unit}' → '{normalized}'"
-                )
-            return normalized
+        # Normally resolved up front by resolve_unknown_units_interactively
+        return self.resolve_unknown_unit(unit, product_name, row_index)
     
-        # Check for partial matches in mapping keys
-        # This handles cases like "TAB S" where there's an extra space
-        for mapped_key, mapped_value in self.UNIT_MAPPING.items():
-            # Remove spaces from both for comparison
-            if unit_no_spaces == mapped_key.replace(' ', ''):
-                normalized = mapped_value
-                if unit != normalized:
-                    self.report['normalizations'].append(
-                        f"Row {row_index}: Unit normalized (partial match) '{unit}' → '{normalized}'"
-                    )
-                return normalized
-        
-        # Check if unit starts with any known unit abbreviation
-        # This handles cases like "TAB S" where "S" might be extra
-        for mapped_key, mapped_value in self.UNIT_MAPPING.items():
-            # Check if the unit (with spaces removed) starts with the mapped key
-            if unit_no_spaces.startswith(mapped_key.replace(' ', '')):
-                normalized = mapped_value
-                if unit != normalized:
-                    self.report['normalizations'].append(
-                        f"Row {row_index}: Unit normalized (starts with) '{unit}' → '{normalized}'"
-                    )
-                return normalized
-        
-        # Check if unit is singular/plural variation of canonical unit
-        # This handles cases like 'Tablets' (plural) when canonical is 'Tablet' (singular)
-        for canonical in self.CANONICAL_UNITS:
-            canonical_lower = canonical.lower()
-            # Check for exact match after removing common plural suffixes
-            unit_singular = self._make_singular(unit_lower)
-            # Also check without spaces
-            unit_no_spaces_singular = self._make_singular(unit_no_spaces)
-
-            if unit_singular == canonical_lower or unit_no_spaces_singular == canonical_lower:
-                self.report['normalizations'].append(
-                    f"Row {row_index}: Unit '{unit}' recognized as plural of '{canonical}'"
-                )
-                return canonical
-        
-        # FIX 3: Check if unit is Title Case version of something in our mapping
-        # This handles cases where user might have manually entered correct Title Case
-        # but it's not in our canonical list (e.g., 'Milliliter' vs 'Millilitre')
-        for mapped_lower, mapped_canonical in self.UNIT_MAPPING.items():
-            if unit.lower() == mapped_lower:
-                # Found a match, return the canonical version
-                self.report['normalizations'].append(
-                    f"Row {row_index}: Unit '{unit}' normalized to '{mapped_canonical}'"
-                )
-                return mapped_canonical
+    def collect_unknown_units(self, rows) -> Dict[str, Tuple[str, str, int]]:
+        """
+        Find units the lookups cannot resolve, without cleaning or reporting anything
+        Returns: {lowercase unit: (unit, product name, row number)} for the first row using each
+        """
+        unknowns = {}
+        seen_names = set()
+        for i, row in enumerate(rows, 1):
+            if _is_blank_row(row):
+                continue
+            
+            # Same Title Case and name cleaning as clean_row, so prompts match what it would show
+            name = row.get('Name')
+            name = ' '.join(_title_case(name).replace(',', ' ').split()) if name else ''
+            if not name:
+                name = f"EMPTY_NAME_ROW_{i}"
+            else:
+                # Duplicate rows are skipped before their unit is looked at
+                name_key = name.lower()
+                if name_key in seen_names:
+                    continue
+                seen_names.add(name_key)
+            
+            unit = row.get('UnitOfMeasure')
+            if not unit or not unit.strip():
+                continue
+            unit = _title_case(unit)
+            if unit.lower() not in unknowns and self._lookup_unit(unit)[0] is None:
+                unknowns[unit.lower()] = (unit, name, i)
+        
+        return unknowns
+    
+    def resolve_unknown_units_interactively(self, unknowns: Dict[str, Tuple[str, str, int]]):
+        """Prompt once per unknown unit so the cleaning pass itself needs no input"""
+        for unit, product_name, row_index in unknowns.values():
+            self.resolve_unknown_unit(unit, product_name, row_index)
+    
+    def resolve_unknown_unit(self, unit: str, product_name: str, row_index: int) -> str:
+        """Ask the user how to handle a unit no lookup recognized, remembering the answer"""
+        unit_lower = unit.lower()
         
         # Check if this looks like it could be a proper unit (Title Case, single word)
         if (unit.istitle() and ' ' not in unit and 
             len(unit) <= 20 and  # Reasonable length for a unit
             unit.isalpha()):  # Only letters
             # Might be a valid unit we don't know about
-            self.report['warnings'].append(
-                f"Row {row_index}: Unit '{unit}' appears to be valid Title Case but not in known units list"
+            self._record('warnings', row_index,
+                "Unit '{}' appears to be valid Title Case but not in known units list", unit
             )
             # Still prompt user to confirm
             
@@ -492,76 +695,31 @@ class InventoryDataCleaner:
             else:
                 print("Invalid choice. Please enter 1, 2, 3, or 4.")
     
-    def _make_singular(self, word: str) -> str:
-        """Convert plural word to singular (basic implementation)"""
-        # Common plural endings
-        if word.endswith('s'):
-            if word.endswith('ies'):
-                return word[:-3] + 'y'
-            elif word.endswith('ves'):
-                return word[:-3] + 'f'
-            elif word.endswith('es') and len(word) > 2:
-                # Check if removing 'es' makes sense
-                base = word[:-2]
-                if base.endswith(('ch', 'sh', 'x', 's', 'z')):
-                    return base
-            else:
-                return word[:-1]
-        return word
-    
-    def handle_empty_sub_accounts(self, row: Dict, row_index: int) -> Dict:
+    def handle_empty_sub_accounts(self, row: Dict, row_index: int) -> None:
         """
         Handle sub-account fields with intelligent normalization
-        Replaces the original simple empty-check logic
+        Replaces the original simple empty-check logic; updates row in place
         """
-        updated_row = row.copy()
-        
-        # Asset Sub Account
-        asset_value = row.get('AssetSubAccount', '')
-        updated_row['AssetSubAccount'] = self.normalize_sub_account(
-            asset_value,
-            self.user_defaults['default_asset_account'],
-            'AssetSubAccount',
-            row_index
-        )
-        
-        # Revenue Sub Account
-        revenue_value = row.get('RevenueSubAccount', '')
-        updated_row['RevenueSubAccount'] = self.normalize_sub_account(
-            revenue_value,
-            self.user_defaults['default_revenue_account'],
-            'RevenueSubAccount',
-            row_index
-        )
-        
-        # Cost of Sale Sub Account
-        cost_value = row.get('CostOfSaleSubAccount', '')
-        updated_row['CostOfSaleSubAccount'] = self.normalize_sub_account(
-            cost_value,
-            self.user_defaults['default_cost_account'],
-            'CostOfSaleSubAccount',
-            row_index
-        )
-        
-        return updated_row
+        defaults = self.user_defaults
+        normalize = self.normalize_sub_account
+        for column, default_key in self._SUB_ACCOUNT_COLUMNS:
+            row[column] = normalize(row.get(column, ''), defaults[default_key], column, row_index)
     
     def validate_numeric(self, value: Any, field_name: str, row_index: int) -> Tuple[Optional[float], bool]:
         """Validate numeric fields"""
-        if value is None or (isinstance(value, str) and value.strip() == ''):
-            self.report['warnings'].append(f"Row {row_index}: {field_name} is empty")
+        if value is None or (isinstance(value, str) and not value.strip()):
+            self._record('warnings', row_index, "{} is empty", field_name)
             return None, True  # Return True to allow default handling
         
         try:
             # Convert to string and clean
             str_value = str(value).strip()
-            # Remove any currency symbols, commas, or extra spaces
-            cleaned = re.sub(r'[^\d.-]', '', str_value)
+            # Remove any currency symbols, commas, or extra spaces (parsed once per distinct value)
+            num_value = _parse_number(str_value)
 
-            if not cleaned:  # If nothing left after cleaning
-                self.report['warnings'].append(f"Row {row_index}: {field_name} is empty after cleaning")
+            if num_value is None:  # If nothing left after cleaning
+                self._record('warnings', row_index, "{} is empty after cleaning", field_name)
                 return None, True
-            
-            num_value = float(cleaned)
 
             # Check for negative values
             if num_value < 0:
@@ -570,13 +728,13 @@ class InventoryDataCleaner:
                 )
                 num_value = 0.0  # Set to 0 for negative values
             
-            if field_name in ['UnitCost', 'UnitPrice']:
+            if field_name in self._CURRENCY_FIELDS:
                 # Ensure exactly 2 decimal places for currency
                 formatted_value = round(num_value, 2)
                 # Check if rounding changed the value
                 if abs(formatted_value - num_value) > 0.0001:  # Small tolerance
-                    self.report['normalizations'].append(
-                        f"Row {row_index}: {field_name} '{value}' rounded to 2 decimal places '{formatted_value:.2f}'"
+                    self._record('normalizations', row_index,
+                        "{} '{}' rounded to 2 decimal places '{:.2f}'", field_name, value, formatted_value
                     )
                 # ALWAYS return formatted_value, not just when rounding changes it
                 return formatted_value, True
@@ -584,8 +742,8 @@ class InventoryDataCleaner:
                 # Convert to integer (whole number)
                 int_value = int(num_value)
                 if int_value != num_value:
-                    self.report['normalizations'].append(
-                        f"Row {row_index}: {field_name} '{value}' converted to integer '{int_value}'"
+                    self._record('normalizations', row_index,
+                        "{} '{}' converted to integer '{}'", field_name, value, int_value
                     )
                 return int_value, True
         except (ValueError, TypeError) as e:
@@ -594,27 +752,27 @@ class InventoryDataCleaner:
     
     def handle_reorder_level(self, value: Any, row_index: int) -> int:
         """Handle ReorderLevel with default value"""
-        if value is None or (isinstance(value, str) and value.strip() == ''):
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Empty ReorderLevel replaced with default '{self.user_defaults['default_reorder_level']}'"
+        if value is None or (isinstance(value, str) and not value.strip()):
+            self._record('defaults_used', row_index,
+                "Empty ReorderLevel replaced with default '{}'", self.user_defaults['default_reorder_level']
             )
-            return int(self.user_defaults['default_reorder_level'])
+            return self._default_reorder_level
         
         # Validate numeric
         validated, is_valid = self.validate_numeric(value, 'ReorderLevel', row_index)
         if not is_valid:
             # If validation fails, use default
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Invalid ReorderLevel '{value}' replaced with default '{self.user_defaults['default_reorder_level']}'"
+            self._record('defaults_used', row_index,
+                "Invalid ReorderLevel '{}' replaced with default '{}'", value, self.user_defaults['default_reorder_level']
             )
-            return int(self.user_defaults['default_reorder_level'])
+            return self._default_reorder_level
         
         if validated is None:
             # Empty but valid case
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Empty ReorderLevel replaced with default '{self.user_defaults['default_reorder_level']}'"
+            self._record('defaults_used', row_index,
+                "Empty ReorderLevel replaced with default '{}'", self.user_defaults['default_reorder_level']
             )
-            return int(self.user_defaults['default_reorder_level'])
+            return self._default_reorder_level
         
         # Ensure positive integer (negative values already handled in validate_numeric)
         reorder_int = int(validated)
@@ -628,65 +786,40 @@ class InventoryDataCleaner:
         
         return reorder_int
     
+    def _fallback_expiry_date(self, reason: str, row_index: int) -> str:
+        """Default expiry date if it is still in the future, otherwise 1 year from today"""
+        if self._default_expiry_is_future:
+            default_date = self.user_defaults['default_expiry_date']
+            self._record('defaults_used', row_index, "{} replaced with default '{}'", reason, default_date)
+            return default_date
+        
+        future_date = self._computed_future_date_str
+        self._record('defaults_used', row_index, "{} replaced with computed future date '{}'", reason, future_date)
+        return future_date
+    
     def handle_expiry_date(self, date_str: str, row_index: int) -> Tuple[str, bool]:
         """
         Handle expiry date with enhanced logic
         Returns: (date_string, is_valid)
         """
-        today = datetime.now()
-        default_date = self.user_defaults['default_expiry_date']
-        
         # Case 1: Empty date
-        if not date_str or date_str.strip() == '':
-            # Use default date if valid
-            try:
-                default_dt = datetime.strptime(default_date, '%d/%m/%Y')
-                if default_dt > today:
-                    self.report['defaults_used'].append(
-                        f"Row {row_index}: Missing expiry date replaced with default '{default_date}'"
-                    )
-                    return default_date, True
-            except ValueError:
-                pass
-            
-            # Compute future date (1 year from today)
-            future_date = (today + timedelta(days=365)).strftime('%d/%m/%Y')
-            self.report['defaults_used'].append(
-                f"Row {row_index}: Missing expiry date replaced with computed future date '{future_date}'"
-            )
-            return future_date, True
+        stripped = date_str.strip() if date_str else ''
+        if not stripped:
+            return self._fallback_expiry_date("Missing expiry date", row_index), True
         
         # Case 2: Validate format and check if expired
-        try:
-            expiry_dt = datetime.strptime(date_str.strip(), '%d/%m/%Y')
-            
-            # Check if date is in the past
-            if expiry_dt <= today:
-                # Use default date if valid and future
-                try:
-                    default_dt = datetime.strptime(default_date, '%d/%m/%Y')
-                    if default_dt > today:
-                        self.report['defaults_used'].append(
-                            f"Row {row_index}: Expired date '{date_str}' replaced with default '{default_date}'"
-                        )
-                        return default_date, True
-                except ValueError:
-                    pass
-                
-                # Compute future date (1 year from today)
-                future_date = (today + timedelta(days=365)).strftime('%d/%m/%Y')
-                self.report['defaults_used'].append(
-                    f"Row {row_index}: Expired date '{date_str}' replaced with computed future date '{future_date}'"
-                )
-                return future_date, True
-            
-            # Date is valid and in future
-            return date_str.strip(), True
-            
-        except ValueError:
+        expiry_dt = _parse_date(stripped)
+        if expiry_dt is None:
             # Invalid format
             self.report['errors'].append(f"Row {row_index}: Invalid expiry date format '{date_str}'")
             return date_str, False
+        
+        # Check if date is in the past
+        if expiry_dt <= self._today:
+            return self._fallback_expiry_date(f"Expired date '{date_str}'", row_index), True
+        
+        # Date is valid and in future
+        return date_str.strip(), True
     
     def clean_row(self, row: Dict, row_index: int) -> Optional[Dict]:
         """
@@ -700,6 +833,7 @@ class InventoryDataCleaner:
         7. Validation (numeric, dates)
         """
         cleaned_row = {}
+        defaults = self.user_defaults
         try:
             # PHASE 1: TITLE CASE NORMALIZATION (First Step)
             # Apply Title Case to specified columns BEFORE any other processing
@@ -713,8 +847,9 @@ class InventoryDataCleaner:
             for column in ['Batch', 'ItemCode', 'Barcode', 'VATType', 'ExpiryDate']:
                 cleaned_row[column] = row.get(column, '')
             
+            # Title-cased columns come back stripped, so an empty check is enough below
             # CHECK FOR EMPTY NAME - Log error but continue processing
-            if not cleaned_row['Name'] or cleaned_row['Name'].strip() == '':
+            if not cleaned_row['Name']:
                 self.report['errors'].append(f"Row {row_index}: Name column is empty - using placeholder")
                 
                 # Use a placeholder name so the row can be processed
@@ -735,10 +870,6 @@ class InventoryDataCleaner:
                         f"Row {row_index} skipped: Duplicate Name '{cleaned_row['Name']}' (already processed in Row {retained_row})"
                     )
                     return None  # Skip this row entirely
-                else:
-                    # Not a duplicate - add normalized name to tracking set
-                    normalized_name = self.normalize_name_key(cleaned_row['Name'])
-                    self.seen_names.add(normalized_name)
         
             # PHASE 4: UNIT OF MEASURE NORMALIZATION (After Title Case and de-duplication)
             # Note: UnitOfMeasure already has Title Case applied
@@ -749,24 +880,24 @@ class InventoryDataCleaner:
         
             # PHASE 5: INTELLIGENT SUB-ACCOUNT NORMALIZATION (After Title Case)
             # Note: Sub-account fields already have Title Case applied
-            cleaned_row = self.handle_empty_sub_accounts(cleaned_row, row_index)
+            self.handle_empty_sub_accounts(cleaned_row, row_index)
         
             # PHASE 6: DEFAULT VALUE APPLICATION
             # Handle VAT Type
             cleaned_row['VATType'] = self.clean_vat_type(cleaned_row['VATType'], row_index)
         
             # Handle Item Class
-            if not cleaned_row['ItemClass'] or cleaned_row['ItemClass'].strip() == '':
-                cleaned_row['ItemClass'] = self.user_defaults['default_item_class']
-                self.report['defaults_used'].append(
-                    f"Row {row_index}: Empty ItemClass replaced with default '{self.user_defaults['default_item_class']}'"
+            if not cleaned_row['ItemClass']:
+                cleaned_row['ItemClass'] = defaults['default_item_class']
+                self._record('defaults_used', row_index,
+                    "Empty ItemClass replaced with default '{}'", defaults['default_item_class']
                 )
         
             # Handle Item Category
-            if not cleaned_row['ItemCategory'] or cleaned_row['ItemCategory'].strip() == '':
-                cleaned_row['ItemCategory'] = self.user_defaults['default_item_category']
-                self.report['defaults_used'].append(
-                    f"Row {row_index}: Empty ItemCategory replaced with default '{self.user_defaults['default_item_category']}'"
+            if not cleaned_row['ItemCategory']:
+                cleaned_row['ItemCategory'] = defaults['default_item_category']
+                self._record('defaults_used', row_index,
+                    "Empty ItemCategory replaced with default '{}'", defaults['default_item_category']
                 )
         
             # PHASE 7: VALIDATION
@@ -800,52 +931,46 @@ class InventoryDataCleaner:
             )
             if not valid:
                 # Instead of skipping row, use default expiry date
-                try:
-                    default_dt = datetime.strptime(self.user_defaults['default_expiry_date'], '%d/%m/%Y')
-                    if default_dt > datetime.now():
-                        expiry_date = self.user_defaults['default_expiry_date']
-                        self.report['defaults_used'].append(
-                            f"Row {row_index}: Invalid expiry date format replaced with default '{expiry_date}'"
-                        )
-                    else:
-                        # Compute future date (1 year from today)
-                        future_date = (datetime.now() + timedelta(days=365)).strftime('%d/%m/%Y')
-                        expiry_date = future_date
-                        self.report['defaults_used'].append(
-                            f"Row {row_index}: Invalid expiry date format replaced with computed future date '{expiry_date}'"
-                        )
-                except ValueError:
-                    # Even default is invalid, compute future date
-                    future_date = (datetime.now() + timedelta(days=365)).strftime('%d/%m/%Y')
-                    expiry_date = future_date
-                    self.report['defaults_used'].append(
-                        f"Row {row_index}: Invalid expiry date format replaced with computed future date '{expiry_date}'"
-                    )
+                expiry_date = self._fallback_expiry_date("Invalid expiry date format", row_index)
         
             cleaned_row['ExpiryDate'] = expiry_date
         
             # Copy remaining fields
-            cleaned_row['Batch'] = cleaned_row.get('Batch', '').strip()
-            cleaned_row['ItemCode'] = str(cleaned_row.get('ItemCode', '')).strip()
-            cleaned_row['Barcode'] = str(cleaned_row.get('Barcode', '')).strip()
+            # DictReader gives str cells, or None past the end of a short row
+            cleaned_row['Batch'] = (cleaned_row['Batch'] or '').strip()
+            cleaned_row['ItemCode'] = (cleaned_row['ItemCode'] or '').strip()
+            cleaned_row['Barcode'] = (cleaned_row['Barcode'] or '').strip()
 
             return cleaned_row
 
         except Exception as e:
             self.report['errors'].append(f"Row {row_index}: Error cleaning row - {str(e)}")
-            import traceback
             self.report['errors'].append(f"Row {row_index}: Traceback - {traceback.format_exc()}")
             return None
 
     def process(self) -> Tuple[bool, str]:
         """Main processing method"""
+        partial_path: Optional[Path] = None
         try:
             # Validate defaults first
             self.validate_defaults()
             
+            # Generate output filename
+            input_path = Path(self.csv_path)
+            output_path = input_path.parent / f"{input_path.stem}_cleaned{input_path.suffix}"
+            # Rows go to a sibling temp file that only replaces output_path once every row is written,
+            # so a failed run never leaves a truncated cleaned CSV that looks like finished output
+            partial_path = output_path.with_name(output_path.name + '.partial')
+            
             # Read input CSV
             # with open(self.csv_path, 'r', encoding='utf-8') as f:
-            with open(self.csv_path, 'r', encoding='utf-8-sig') as f:
+            with open(self.csv_path, 'r', newline='', encoding='utf-8-sig', buffering=1 << 20) as f:
+                # Both passes below read the file front to back, so ask for aggressive read-ahead
+                if hasattr(os, 'posix_fadvise'):
+                    try:
+                        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    except OSError:
+                        pass
                 reader = csv.DictReader(f)
                 
                 # Validate required columns
@@ -853,32 +978,39 @@ class InventoryDataCleaner:
                 if missing_cols:
                     raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
                 
-                # Reset tracking sets for new processing run
+                # Ask about unknown units up front so the cleaning pass runs without prompts
+                self.resolve_unknown_units_interactively(self.collect_unknown_units(reader))
+                f.seek(0)
+                reader = csv.DictReader(f)
+                
+                # Reset name tracking for new processing run
                 self.seen_names.clear()
+                self.rows_cleaned = 0
                 
-                # Process each row with strict ordering
-                rows_processed = 0
-                for i, row in enumerate(reader, 1):
-                    # Skip empty rows (all values are empty or whitespace)
-                    if all(str(value).strip() == '' for value in row.values()):
-                        continue # Skip completely empty rows    
-                    cleaned = self.clean_row(row, i)
-                    if cleaned:
-                        self.cleaned_data.append(cleaned)
-                    rows_processed += 1
+                # Write each cleaned row as soon as it is produced instead of buffering the file;
+                # a 1 MiB write buffer batches the small per-row writes into few system calls
+                with open(partial_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as out:
+                    # clean_row builds exactly REQUIRED_COLUMNS; itemgetter pulls them out in column
+                    # order in one C call, so plain csv.writer replaces DictWriter's per-row generator
+                    writer = csv.writer(out)
+                    writer.writerow(self.REQUIRED_COLUMNS)
+                    output_values = itemgetter(*self.REQUIRED_COLUMNS)
+                    
+                    # Process each row with strict ordering
+                    rows_processed = 0
+                    for i, row in enumerate(reader, 1):
+                        # Skip empty rows (all values are empty or whitespace)
+                        if _is_blank_row(row):
+                            continue # Skip completely empty rows    
+                        cleaned = self.clean_row(row, i)
+                        if cleaned:
+                            writer.writerow(output_values(cleaned))
+                            self.rows_cleaned += 1
+                        rows_processed += 1
+                os.replace(partial_path, output_path)
 
                 print(f"Total non-empty rows processed: {rows_processed}")
-                print(f"Rows successfully cleaned: {len(self.cleaned_data)}")
-
-            # Generate output filename
-            input_path = Path(self.csv_path)
-            output_path = input_path.parent / f"{input_path.stem}_cleaned{input_path.suffix}"
-            
-            # Write cleaned data
-            with open(output_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.REQUIRED_COLUMNS)
-                writer.writeheader()
-                writer.writerows(self.cleaned_data)
+                print(f"Rows successfully cleaned: {self.rows_cleaned}")
             
             # Generate report
             report_path = input_path.parent / f"{input_path.stem}_cleanup_report.txt"
@@ -887,177 +1019,189 @@ class InventoryDataCleaner:
             return True, str(output_path)
             
         except Exception as e:
+            if partial_path is not None:
+                partial_path.unlink(missing_ok=True)
             self.report['errors'].append(f"Processing failed: {str(e)}")
-            import traceback
             self.report['errors'].append(f"Traceback: {traceback.format_exc()}")
             self.generate_report(Path(self.csv_path).parent / "cleanup_error_report.txt")
             return False, str(e)
     
     def generate_report(self, report_path: Path):
         """Generate comprehensive cleanup report with duplicates section"""
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write("MEDICENTRE v3 INVENTORY DATA CLEANUP REPORT\n")
-            f.write("=" * 80 + "\n\n")
-            
-            f.write(f"Input File: {self.csv_path}\n")
-            f.write(f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Rows Processed: {len(self.cleaned_data)}\n")
-            f.write(f"Rows Skipped: {len([e for e in self.report['errors'] if 'Row' in e])}\n")
-            f.write(f"Duplicates Removed: {len(self.report['duplicates_removed'])}\n\n")
-            
-            f.write("DEFAULTS CONFIGURED:\n")
-            f.write("-" * 80 + "\n")
-            for key, value in self.user_defaults.items():
-                if key.startswith('default_'):
-                    f.write(f"• {key}: {value}\n")
-            f.write("\n")
-            
-            f.write("CANONICAL UNITS RECOGNIZED:\n")
-            f.write("-" * 80 + "\n")
-            for unit in sorted(self.CANONICAL_UNITS):
-                f.write(f"• {unit}\n")
-            f.write("\n")
-            
-            f.write("DUPLICATES REMOVED:\n")
-            f.write("-" * 80 + "\n")
-            for item in self.report['duplicates_removed']:
-                f.write(f"• {item}\n")
-            if not self.report['duplicates_removed']:
-                f.write("No duplicates found.\n")
-            f.write("\n")
-            
-            f.write("DEFAULTS USED:\n")
-            f.write("-" * 80 + "\n")
-            for item in self.report['defaults_used']:
-                f.write(f"• {item}\n")
-            if not self.report['defaults_used']:
-                f.write("No defaults were used.\n")
-            f.write("\n")
-            
-            f.write("NORMALIZATIONS APPLIED:\n")
-            f.write("-" * 80 + "\n")
-            for item in self.report['normalizations']:
-                f.write(f"• {item}\n")
-            if not self.report['normalizations']:
-                f.write("No normalizations were needed.\n")
-            f.write("\n")
-            
-            f.write("USER DECISIONS (Interactive Resolutions):\n")
-            f.write("-" * 80 + "\n")
-            for item in self.report['user_decisions']:
-                f.write(f"• {item}\n")
-            if not self.report['user_decisions']:
-                f.write("No user interventions were required.\n")
-            f.write("\n")
-            
-            f.write("EMPTY NAME ERRORS:\n")
-            f.write("-" * 80 + "\n")
-            empty_name_errors = [e for e in self.report['errors'] if 'Name column is empty' in e]
-            for item in empty_name_errors:
-                f.write(f"⚠ {item}\n")
-            if not empty_name_errors:
-                f.write("No empty name errors.\n")
-            f.write("\n")
+        # Build the report in memory and write it with a single call
+        parts = []
+        write = parts.append
+        
+        write("MEDICENTRE v3 INVENTORY DATA CLEANUP REPORT\n")
+        write("=" * 80 + "\n\n")
+        
+        defaults_used = self.report_entries('defaults_used')
+        normalizations = self.report_entries('normalizations')
+        warnings = self.report_entries('warnings')
+        
+        write(f"Input File: {self.csv_path}\n")
+        write(f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        write(f"Rows Processed: {self.rows_cleaned}\n")
+        write(f"Rows Skipped: {len([e for e in self.report['errors'] if 'Row' in e])}\n")
+        write(f"Duplicates Removed: {len(self.report['duplicates_removed'])}\n\n")
+        
+        write("DEFAULTS CONFIGURED:\n")
+        write("-" * 80 + "\n")
+        for key, value in self.user_defaults.items():
+            if key.startswith('default_'):
+                write(f"• {key}: {value}\n")
+        write("\n")
+        
+        write("CANONICAL UNITS RECOGNIZED:\n")
+        write("-" * 80 + "\n")
+        for unit in sorted(self.CANONICAL_UNITS):
+            write(f"• {unit}\n")
+        write("\n")
+        
+        write("DUPLICATES REMOVED:\n")
+        write("-" * 80 + "\n")
+        for item in self.report['duplicates_removed']:
+            write(f"• {item}\n")
+        if not self.report['duplicates_removed']:
+            write("No duplicates found.\n")
+        write("\n")
+        
+        write("DEFAULTS USED:\n")
+        write("-" * 80 + "\n")
+        for item, count in defaults_used:
+            write(f"• {_with_count(item, count)}\n")
+        if not defaults_used:
+            write("No defaults were used.\n")
+        write("\n")
+        
+        write("NORMALIZATIONS APPLIED:\n")
+        write("-" * 80 + "\n")
+        for item, count in normalizations:
+            write(f"• {_with_count(item, count)}\n")
+        if not normalizations:
+            write("No normalizations were needed.\n")
+        write("\n")
+        
+        write("USER DECISIONS (Interactive Resolutions):\n")
+        write("-" * 80 + "\n")
+        for item in self.report['user_decisions']:
+            write(f"• {item}\n")
+        if not self.report['user_decisions']:
+            write("No user interventions were required.\n")
+        write("\n")
+        
+        write("EMPTY NAME ERRORS:\n")
+        write("-" * 80 + "\n")
+        empty_name_errors = [e for e in self.report['errors'] if 'Name column is empty' in e]
+        for item in empty_name_errors:
+            write(f"⚠ {item}\n")
+        if not empty_name_errors:
+            write("No empty name errors.\n")
+        write("\n")
 
-            f.write("UNIT OF MEASURE RESOLUTIONS:\n")
-            f.write("-" * 80 + "\n")
-            for unit, resolution in self.unit_resolutions.items():
-                f.write(f"• '{unit}' → '{resolution}'\n")
-            if not self.unit_resolutions:
-                f.write("No unit of measure resolutions were made.\n")
-            f.write("\n")
-            
-            f.write("SUB-ACCOUNT NORMALIZATIONS SUMMARY:\n")
-            f.write("-" * 80 + "\n")
-            # Count sub-account normalizations
-            sub_account_norms = [n for n in self.report['normalizations'] if 'SubAccount' in n]
-            f.write(f"Total sub-account normalizations: {len(sub_account_norms)}\n")
-            for norm in sub_account_norms:
-                if 'AssetSubAccount' in norm:
-                    f.write(f"  • Asset: {norm.split(': ')[1] if ': ' in norm else norm}\n")
-                elif 'RevenueSubAccount' in norm:
-                    f.write(f"  • Revenue: {norm.split(': ')[1] if ': ' in norm else norm}\n")
-                elif 'CostOfSaleSubAccount' in norm:
-                    f.write(f"  • Cost: {norm.split(': ')[1] if ': ' in norm else norm}\n")
-            f.write("\n")
-            
-            f.write("WARNINGS:\n")
-            f.write("-" * 80 + "\n")
-            for item in self.report['warnings']:
-                f.write(f"⚠ {item}\n")
-            if not self.report['warnings']:
-                f.write("No warnings.\n")
-            f.write("\n")
-            
-            f.write("ERRORS:\n")
-            f.write("-" * 80 + "\n")
-            for item in self.report['errors']:
-                f.write(f"✗ {item}\n")
-            if not self.report['errors']:
-                f.write("No errors.\n")
-            
-            f.write("\n" + "=" * 80 + "\n")
-            f.write("NUMERIC VALIDATION SUMMARY:\n")
-            f.write("-" * 80 + "\n")
-            
-            # Count negative value corrections
-            negative_corrections = [e for e in self.report['errors'] if 'has negative value' in e]
-            f.write(f"Negative values corrected: {len(negative_corrections)}\n")
-            
-            # Count decimal normalizations
-            decimal_norms = [n for n in self.report['normalizations'] if 'rounded to 2 decimal places' in n]
-            f.write(f"Decimal values normalized: {len(decimal_norms)}\n")
-            
-            # Count integer conversions
-            int_conversions = [n for n in self.report['normalizations'] if 'converted to integer' in n]
-            f.write(f"Values converted to integers: {len(int_conversions)}\n")
-            
-            # List some examples if any
-            if negative_corrections:
-                f.write("\nExamples of negative value corrections:\n")
-                for i, error in enumerate(negative_corrections[:5]):  # Show first 5
-                    f.write(f"  {i+1}. {error}\n")
-                if len(negative_corrections) > 5:
-                    f.write(f"  ... and {len(negative_corrections) - 5} more\n")
-            
-            f.write("\n")
+        write("UNIT OF MEASURE RESOLUTIONS:\n")
+        write("-" * 80 + "\n")
+        for unit, resolution in self.unit_resolutions.items():
+            write(f"• '{unit}' → '{resolution}'\n")
+        if not self.unit_resolutions:
+            write("No unit of measure resolutions were made.\n")
+        write("\n")
+        
+        write("SUB-ACCOUNT NORMALIZATIONS SUMMARY:\n")
+        write("-" * 80 + "\n")
+        # Count sub-account normalizations
+        sub_account_norms = [(n, count) for n, count in normalizations if 'SubAccount' in n]
+        sub_account_count = sum(count for _, count in sub_account_norms)
+        write(f"Total sub-account normalizations: {sub_account_count}\n")
+        for norm, count in sub_account_norms:
+            detail = _with_count(norm.split(': ', 1)[1] if ': ' in norm else norm, count)
+            if 'AssetSubAccount' in norm:
+                write(f"  • Asset: {detail}\n")
+            elif 'RevenueSubAccount' in norm:
+                write(f"  • Revenue: {detail}\n")
+            elif 'CostOfSaleSubAccount' in norm:
+                write(f"  • Cost: {detail}\n")
+        write("\n")
+        
+        write("WARNINGS:\n")
+        write("-" * 80 + "\n")
+        for item, count in warnings:
+            write(f"⚠ {_with_count(item, count)}\n")
+        if not warnings:
+            write("No warnings.\n")
+        write("\n")
+        
+        write("ERRORS:\n")
+        write("-" * 80 + "\n")
+        for item in self.report['errors']:
+            write(f"✗ {item}\n")
+        if not self.report['errors']:
+            write("No errors.\n")
+        
+        write("\n" + "=" * 80 + "\n")
+        write("NUMERIC VALIDATION SUMMARY:\n")
+        write("-" * 80 + "\n")
+        
+        # Count negative value corrections
+        negative_corrections = [e for e in self.report['errors'] if 'has negative value' in e]
+        write(f"Negative values corrected: {len(negative_corrections)}\n")
+        
+        # Count decimal normalizations
+        decimal_norms = sum(count for n, count in normalizations if 'rounded to 2 decimal places' in n)
+        write(f"Decimal values normalized: {decimal_norms}\n")
+        
+        # Count integer conversions
+        int_conversions = sum(count for n, count in normalizations if 'converted to integer' in n)
+        write(f"Values converted to integers: {int_conversions}\n")
+        
+        # List some examples if any
+        if negative_corrections:
+            write("\nExamples of negative value corrections:\n")
+            for i, error in enumerate(negative_corrections[:5]):  # Show first 5
+                write(f"  {i+1}. {error}\n")
+            if len(negative_corrections) > 5:
+                write(f"  ... and {len(negative_corrections) - 5} more\n")
+        
+        write("\n")
 
-            f.write("\n" + "=" * 80 + "\n")
-            f.write("CLEANING STATISTICS:\n")
-            f.write("-" * 80 + "\n")
-            total_rows = len(self.cleaned_data) + len([e for e in self.report['errors'] if 'Row' in e]) + len(self.report['duplicates_removed'])
-            f.write(f"Total rows in input: {total_rows}\n")
-            f.write(f"Rows successfully cleaned: {len(self.cleaned_data)}\n")
-            f.write(f"Duplicates removed: {len(self.report['duplicates_removed'])}\n")
-            f.write(f"Rows with errors: {len([e for e in self.report['errors'] if 'Row' in e])}\n")
-            f.write(f"Defaults applied: {len(self.report['defaults_used'])}\n")
-            f.write(f"Normalizations: {len(self.report['normalizations'])}\n")
-            f.write(f"User decisions: {len(self.report['user_decisions'])}\n")
-            f.write(f"Warnings: {len(self.report['warnings'])}\n")
-            f.write(f"Errors: {len(self.report['errors'])}\n")
+        write("\n" + "=" * 80 + "\n")
+        write("CLEANING STATISTICS:\n")
+        write("-" * 80 + "\n")
+        total_rows = self.rows_cleaned + len([e for e in self.report['errors'] if 'Row' in e]) + len(self.report['duplicates_removed'])
+        write(f"Total rows in input: {total_rows}\n")
+        write(f"Rows successfully cleaned: {self.rows_cleaned}\n")
+        write(f"Duplicates removed: {len(self.report['duplicates_removed'])}\n")
+        write(f"Rows with errors: {len([e for e in self.report['errors'] if 'Row' in e])}\n")
+        write(f"Defaults applied: {self.report_count('defaults_used')}\n")
+        write(f"Normalizations: {self.report_count('normalizations')}\n")
+        write(f"User decisions: {len(self.report['user_decisions'])}\n")
+        write(f"Warnings: {self.report_count('warnings')}\n")
+        write(f"Errors: {len(self.report['errors'])}\n")
 
-            # Numeric validation stats
-            f.write(f"Negative values corrected: {len(negative_corrections)}\n")
-            f.write(f"Decimal normalizations: {len(decimal_norms)}\n")
-            f.write(f"Integer conversions: {len(int_conversions)}\n")
-            
-            # Sub-account statistics
-            sub_account_norms = [n for n in self.report['normalizations'] if 'SubAccount' in n]
-            f.write(f"Sub-account normalizations: {len(sub_account_norms)}\n")
-            
-            # De-duplication summary
-            f.write("\n" + "=" * 80 + "\n")
-            f.write("DE-DUPLICATION SUMMARY:\n")
-            f.write("-" * 80 + "\n")
-            f.write(f"Unique products after de-duplication: {len(self.cleaned_data)}\n")
-            f.write(f"Duplicate products removed: {len(self.report['duplicates_removed'])}\n")
-            if total_rows > 0:
-                f.write(f"De-duplication efficiency: {len(self.report['duplicates_removed'])/total_rows*100:.1f}%\n")
-            else:
-                f.write(f"De-duplication efficiency: N/A (no rows processed)\n")
+        # Numeric validation stats
+        write(f"Negative values corrected: {len(negative_corrections)}\n")
+        write(f"Decimal normalizations: {decimal_norms}\n")
+        write(f"Integer conversions: {int_conversions}\n")
+        
+        # Sub-account statistics
+        write(f"Sub-account normalizations: {sub_account_count}\n")
+        
+        # De-duplication summary
+        write("\n" + "=" * 80 + "\n")
+        write("DE-DUPLICATION SUMMARY:\n")
+        write("-" * 80 + "\n")
+        write(f"Unique products after de-duplication: {self.rows_cleaned}\n")
+        write(f"Duplicate products removed: {len(self.report['duplicates_removed'])}\n")
+        if total_rows > 0:
+            write(f"De-duplication efficiency: {len(self.report['duplicates_removed'])/total_rows*100:.1f}%\n")
+        else:
+            write(f"De-duplication efficiency: N/A (no rows processed)\n")
 
-            f.write("\n" + "=" * 80 + "\n")
-            f.write("END OF REPORT\n")
+        write("\n" + "=" * 80 + "\n")
+        write("END OF REPORT\n")
+        
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
 
 
 def run_data_cleaner():
@@ -1172,14 +1316,14 @@ def run_data_cleaner():
         print(f"Cleaned file: {result}")
         print(f"Report generated: {Path(csv_path).parent / (Path(csv_path).stem + '_cleanup_report.txt')}")
         print(f"\nSummary:")
-        print(f"  Total rows processed: {len(cleaner.cleaned_data) + len(cleaner.report['duplicates_removed']) + len([e for e in cleaner.report['errors'] if 'Row' in e])}")
-        print(f"  Unique products retained: {len(cleaner.cleaned_data)}")
+        print(f"  Total rows processed: {cleaner.rows_cleaned + len(cleaner.report['duplicates_removed']) + len([e for e in cleaner.report['errors'] if 'Row' in e])}")
+        print(f"  Unique products retained: {cleaner.rows_cleaned}")
         print(f"  Duplicates removed: {len(cleaner.report['duplicates_removed'])}")
-        print(f"  Defaults applied: {len(cleaner.report['defaults_used'])}")
-        print(f"  Normalizations: {len(cleaner.report['normalizations'])}")
-        print(f"  Sub-account normalizations: {len([n for n in cleaner.report['normalizations'] if 'SubAccount' in n])}")
+        print(f"  Defaults applied: {cleaner.report_count('defaults_used')}")
+        print(f"  Normalizations: {cleaner.report_count('normalizations')}")
+        print(f"  Sub-account normalizations: {sum(count for n, count in cleaner.report_entries('normalizations') if 'SubAccount' in n)}")
         print(f"  User decisions: {len(cleaner.report['user_decisions'])}")
-        print(f"  Warnings: {len(cleaner.report['warnings'])}")
+        print(f"  Warnings: {cleaner.report_count('warnings')}")
         print(f"  Errors: {len(cleaner.report['errors'])}")
     else:
         print(f"\n✗ CLEANUP FAILED: {result}")
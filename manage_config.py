@@ -9,6 +9,9 @@ def manage_configuration():
     print("MEDICENTRE CONFIGURATION MANAGER")
     print("=" * 60)
     
+    # Warm the config file while the menu waits for input
+    ConfigLoader.prefetch()
+    
     while True:
         print("\nOptions:")
         print("  1. Create new configuration")
@@ -26,8 +29,7 @@ def manage_configuration():
             
         elif choice == "2":
             try:
-                with open(ConfigLoader.DEFAULT_CONFIG_PATH, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = ConfigLoader.read_config(ConfigLoader.DEFAULT_CONFIG_PATH)
                 print("\nCurrent Configuration:")
                 print("=" * 40)
                 print(json.dumps(config, indent=2))
@@ -37,8 +39,7 @@ def manage_configuration():
                 
         elif choice == "3":
             try:
-                with open(ConfigLoader.DEFAULT_CONFIG_PATH, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = ConfigLoader.read_config(ConfigLoader.DEFAULT_CONFIG_PATH)
                 
                 print("\nCurrent configuration keys:")
                 for key in config.keys():
@@ -72,8 +73,7 @@ def manage_configuration():
                 
         elif choice == "5":
             try:
-                with open(ConfigLoader.DEFAULT_CONFIG_PATH, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = ConfigLoader.read_config(ConfigLoader.DEFAULT_CONFIG_PATH)
                 
                 export_path = input("Export file path: ").strip()
                 if export_path:
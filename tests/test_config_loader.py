@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+
+import pytest
+
+import config_loader
+from config_loader import ConfigLoader, _patch_path, _set_path
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    ConfigLoader.invalidate_cache()
+    yield
+    ConfigLoader.invalidate_cache()
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'vat_default_rate': 16, 'account_mappings': {'inventory_main': 'Inventory'}}))
+    return path
+
+
+def test_patches_replay_in_order_over_the_base_file(config_file):
+    ConfigLoader.update_config_field(config_file, 'vat_default_rate', 8)
+    ConfigLoader.update_config_field(config_file, 'account_mappings.revenue_main', 'Revenue')
+    ConfigLoader.update_config_field(config_file, 'vat_default_rate', 0)
+    
+    # The base file is untouched; the updates live in the patch log
+    assert json.loads(config_file.read_text())['vat_default_rate'] == 16
+    assert ConfigLoader.read_config(config_file) == {
+        'vat_default_rate': 0,
+        'account_mappings': {'inventory_main': 'Inventory', 'revenue_main': 'Revenue'},
+    }
+
+
+def test_long_patch_log_is_folded_into_the_file(config_file, monkeypatch):
+    monkeypatch.setattr(ConfigLoader, 'PATCH_COMPACT_THRESHOLD', 2)
+    for rate in (1, 2, 3):
+        ConfigLoader.update_config_field(config_file, 'vat_default_rate', rate)
+    
+    assert ConfigLoader.read_config(config_file)['vat_default_rate'] == 3
+    assert not _patch_path(config_file).exists()
+    assert json.loads(config_file.read_text())['vat_default_rate'] == 3
+
+
+def test_path_through_a_plain_value_is_rejected_and_not_logged(config_file, capsys):
+    with pytest.raises(TypeError):
+        _set_path({'vat_default_rate': 16}, 'vat_default_rate.x', 1)
+    
+    ConfigLoader.update_config_field(config_file, 'vat_default_rate.x', 1)
+    
+    assert '✗ Error updating configuration' in capsys.readouterr().out
+    assert not _patch_path(config_file).exists()
+    assert ConfigLoader.read_config(config_file)['vat_default_rate'] == 16
+
+
+def test_bad_line_already_in_the_log_is_skipped(config_file):
+    _patch_path(config_file).write_bytes(
+        b'{"p":"vat_default_rate.x","v":1}\n{"p":"vat_default_rate","v":5}\n{"p":"torn'
+    )
+    assert ConfigLoader.read_config(config_file)['vat_default_rate'] == 5
+
+
+def test_patch_written_after_the_base_file_is_picked_up(config_file):
+    # Base file older than any patch, as after an untouched config is edited later
+    os.utime(config_file, ns=(1_000_000_000, 1_000_000_000))
+    assert ConfigLoader.load_config(str(config_file))['vat_default_rate'] == 16
+    
+    ConfigLoader.update_config_field(config_file, 'vat_default_rate', 12)
+    
+    assert ConfigLoader.read_config(config_file)['vat_default_rate'] == 12
+    assert ConfigLoader.load_config(str(config_file))['vat_default_rate'] == 12
+
+
+def test_load_config_returns_a_private_copy(config_file):
+    config = ConfigLoader.load_config(str(config_file))
+    config['vat_default_rate'] = 99
+    config['account_mappings']['inventory_main'] = 'Changed'
+    
+    again = ConfigLoader.load_config(str(config_file))
+    assert again['vat_default_rate'] == 16
+    assert again['account_mappings']['inventory_main'] == 'Inventory'
+    json.dumps(again)
+
+
+def test_load_config_readonly_rejects_assignment(config_file):
+    config = ConfigLoader.load_config_readonly(str(config_file))
+    with pytest.raises(TypeError):
+        config['vat_default_rate'] = 99
+    with pytest.raises(TypeError):
+        config['account_mappings']['inventory_main'] = 'Changed'
+    assert ConfigLoader.load_config_readonly(str(config_file)) is config
+
+
+def test_save_config_evicts_the_cached_entry(config_file):
+    ConfigLoader.load_config_readonly(str(config_file))
+    ConfigLoader.save_config({'vat_default_rate': 0}, config_file)
+    
+    assert not ConfigLoader._CACHE
+    assert ConfigLoader.load_config(str(config_file)) == {'vat_default_rate': 0}
+
+
+def test_invalidate_cache_evicts_only_that_file(config_file, tmp_path):
+    other = tmp_path / 'other.json'
+    other.write_text('{}')
+    first = ConfigLoader.load_config_readonly(str(config_file))
+    ConfigLoader.load_config_readonly(str(other))
+    
+    ConfigLoader.invalidate_cache(config_file)
+    
+    assert [key[0] for key in ConfigLoader._CACHE] == [str(other.resolve())]
+    assert ConfigLoader.load_config_readonly(str(config_file)) is not first
+
+
+def test_concurrent_saves_leave_one_complete_file(config_file):
+    configs = [{'writer': n, 'padding': 'x' * 100_000} for n in range(8)]
+    threads = [threading.Thread(target=ConfigLoader._write_atomic, args=(config_file, json.dumps(c).encode()))
+               for c in configs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert json.loads(config_file.read_text()) in configs
+    assert [p.name for p in config_file.parent.iterdir()] == ['config.json']
+
+
+@pytest.mark.parametrize('padding', [0, 100_000])
+def test_config_with_utf8_bom_loads(tmp_path, padding):
+    # The padded file is large enough to be parsed from an mmap
+    path = tmp_path / 'config.json'
+    path.write_bytes(b'\xef\xbb\xbf' + json.dumps({'base_url': 'https://x', 'notes': ' ' * padding}).encode())
+    
+    assert ConfigLoader.read_config(path)['base_url'] == 'https://x'
+    assert config_loader._loads(b'\xef\xbb\xbf{"a": 1}') == {'a': 1}
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('0', 0), ('16', 16), ('100', 100),
+    ('', 16), ('abc', 16), ('-5', 16), ('101', 16), ('7.5', 16),
+])
+def test_vat_rate_prompt_accepts_only_0_to_100(raw, expected):
+    assert config_loader._vat_rate(raw) == expected
@@ -0,0 +1,152 @@
+from difflib import SequenceMatcher
+
+import pytest
+
+import inventory_cleaner
+from inventory_cleaner import InventoryDataCleaner, _preprocess_for_comparison
+
+DEFAULTS = {
+    'default_vat_type': 'VAT Exempt',
+    'default_item_class': 'Drugs',
+    'default_item_category': 'Pharmacy',
+    'default_unit_of_measure': 'Piece',
+    'default_expiry_date': '31/12/2099',
+}
+
+
+@pytest.fixture
+def cleaner():
+    return InventoryDataCleaner('inventory.csv', dict(DEFAULTS))
+
+
+def _difflib_similarity(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _rapidfuzz_similarity(a, b):
+    fuzz = pytest.importorskip('rapidfuzz.fuzz')
+    return fuzz.ratio(a, b) / 100.0
+
+
+# 'Inventory Sales' sits either side of the 0.60 threshold depending on the backend
+BORDERLINE_VALUE = 'Inventory Sales'
+BORDERLINE_DEFAULT = 'Inventory - Pharmacy Drugs'
+
+
+@pytest.mark.parametrize('similarity, expected_score, expected_section', [
+    (_difflib_similarity, 0.56, 'defaults_used'),
+    (_rapidfuzz_similarity, 0.62, 'normalizations'),
+])
+def test_borderline_sub_account_under_each_backend(cleaner, monkeypatch, similarity, expected_score, expected_section):
+    a = _preprocess_for_comparison(BORDERLINE_VALUE)
+    b = _preprocess_for_comparison(BORDERLINE_DEFAULT)
+    assert round(similarity(a, b), 2) == expected_score
+    
+    monkeypatch.setattr(inventory_cleaner, '_similarity', similarity)
+    inventory_cleaner._sub_account_similarity.cache_clear()
+    try:
+        result = cleaner.normalize_sub_account(BORDERLINE_VALUE, BORDERLINE_DEFAULT, 'AssetSubAccount', 2)
+    finally:
+        inventory_cleaner._sub_account_similarity.cache_clear()
+    
+    assert result == BORDERLINE_DEFAULT
+    assert cleaner.report_count(expected_section) == 1
+
+
+def test_failed_run_leaves_no_cleaned_csv(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'inventory.csv'
+    header = ','.join(InventoryDataCleaner.REQUIRED_COLUMNS)
+    csv_path.write_text(f"{header}\nParacetamol,,,,,,,,Tablet,,,1,1,1,,\n", encoding='utf-8')
+    cleaner = InventoryDataCleaner(str(csv_path), dict(DEFAULTS))
+    
+    def fail(row, row_index):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(cleaner, 'clean_row', fail)
+    
+    success, message = cleaner.process()
+    
+    assert not success and message == 'disk full'
+    assert not (tmp_path / 'inventory_cleaned.csv').exists()
+    assert not (tmp_path / 'inventory_cleaned.csv.partial').exists()
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("Don't Panic", "Don't Panic"),
+    ("JOHNSON'S baby oil", "Johnson's Baby Oil"),
+    ("O'brien", "O'brien"),
+    ("paracetamol 500mg", "Paracetamol 500Mg"),
+    ("Paracetamol500mg", "Paracetamol500mg"),
+    ("X-RAY film", "X-RAY Film"),
+    ("vat exempt", "VAT Exempt"),
+])
+def test_title_case(value, expected):
+    assert inventory_cleaner._title_case(value) == expected
+
+
+def test_expiry_handling_works_without_process(cleaner):
+    assert cleaner.handle_expiry_date('', 2) == ('31/12/2099', True)
+    assert cleaner.handle_expiry_date('01/01/2000', 3) == ('31/12/2099', True)
+
+
+def test_report_count_follows_full_sub_account_message(cleaner, tmp_path):
+    for row_index in (2, 3):
+        cleaner.normalize_sub_account('Pharmacy Drugs Inventory', 'Inventory - Pharmacy Drugs', 'AssetSubAccount', row_index)
+    report_path = tmp_path / 'report.txt'
+    cleaner.generate_report(report_path)
+    
+    report = report_path.read_text(encoding='utf-8')
+    assert "  • Asset: AssetSubAccount normalized 'Pharmacy Drugs Inventory' → 'Inventory - Pharmacy Drugs' (similarity: 1.00) (×2)\n" in report
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('L-Arginine 500Mg Capsules', 'Capsule'),
+    ('Tb Rapid Test Kit', 'Kit'),
+    ('Injection Water 10Ml Vials', 'Vial'),
+    ('Amoxicillin Capsules 500mg', 'Capsule'),
+    ('Distilled Water 5L', 'Litre'),
+])
+def test_empty_unit_taken_from_name(cleaner, name, expected):
+    assert cleaner.normalize_unit_of_measure('', name, 2) == expected
+
+
+@pytest.mark.parametrize('name', ['Gr 2 Surgical Gloves', 'L-Arginine', 'Tb Rapid Test'])
+def test_short_abbreviations_in_name_need_a_number(cleaner, name):
+    assert cleaner._unit_in_name(name) is None
+
+
+def test_reorder_default_works_without_process(cleaner):
+    assert cleaner.handle_reorder_level('', 2) == 10
+
+
+def test_unit_and_vat_defaults_work_without_process(cleaner):
+    assert cleaner.normalize_unit_of_measure('', 'Gr 2 Surgical Gloves', 2) == 'Piece'
+    assert cleaner.clean_vat_type('', 2) == 'VAT Exempt'
+
+
+def test_clean_row_works_without_process(cleaner):
+    row = dict.fromkeys(InventoryDataCleaner.REQUIRED_COLUMNS, '')
+    row.update(Name='paracetamol 500mg tablets', UnitCost='1', TotalQuantity='5', UnitPrice='2')
+    
+    cleaned = cleaner.clean_row(row, 2)
+    
+    assert not cleaner.report['errors']
+    assert cleaned['Name'] == 'Paracetamol 500Mg Tablets'
+    assert cleaned['UnitOfMeasure'] == 'Tablet'
+    assert cleaned['VATType'] == 'VAT Exempt'
+    assert cleaned['ReorderLevel'] == 10
+    assert cleaned['ExpiryDate'] == '31/12/2099'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1500', 1500.0),
+    ('12.50', 12.5),
+    ('1²', 1.0),
+    ('KSh 1,200.00', 1200.0),
+])
+def test_parse_number(text, expected):
+    assert inventory_cleaner._parse_number(text) == expected
+
+
+def test_superscript_digit_is_stripped_not_rejected(cleaner):
+    assert cleaner.validate_numeric('1²', 'TotalQuantity', 2) == (1, True)
+    assert not cleaner.report['errors']